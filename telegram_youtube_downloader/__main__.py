@@ -1,4 +1,6 @@
 from telegram_youtube_downloader.cli import Cli
+from telegram_youtube_downloader.trace_report import TraceReport
+from telegram_youtube_downloader.audio_benchmark import AudioBenchmark
 from telegram_youtube_downloader.utils.config_utils import ConfigUtils
 from telegram_youtube_downloader.utils.logger_utils import LoggerFactory
 
@@ -11,5 +13,13 @@ def bootstrap():
 	cli.start()
 
 
+def trace_report():
+	TraceReport().start()
+
+
+def audio_benchmark():
+	AudioBenchmark().start()
+
+
 if __name__ == "__main__":
 	bootstrap()
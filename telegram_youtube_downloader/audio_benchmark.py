@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import yt_dlp as yt
+from yt_dlp.postprocessor.ffmpeg import FFmpegExtractAudioPP
+
+
+class AudioBenchmark:
+	"""
+	Compares CPU seconds per audio hour of the stream copy and mp3 conversion paths.
+	Files are processed with the same yt_dlp postprocessor the downloader uses, ffmpeg runs as a child process.
+	"""
+
+	# Path name -> preferredcodec of FFmpegExtractAudio
+	__paths = {"copy": "best", "mp3": "mp3"}
+	# Synthetic sources, same codecs and bitrates youtube serves
+	__generated_sources = {
+		"aac.m4a": ["-c:a", "aac", "-b:a", "128k"],
+		"opus.webm": ["-c:a", "libopus", "-b:a", "160k"],
+	}
+
+	@staticmethod
+	def __get_child_cpu_seconds() -> float:
+		usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+		return usage.ru_utime + usage.ru_stime
+
+	@staticmethod
+	def __generate_sources(ffmpeg_path: str, seconds: int, folder: str) -> list[str]:
+		"""Pink noise is used instead of silence, silence encodes unrealistically fast"""
+		paths = []
+		for file_name, codec_args in AudioBenchmark.__generated_sources.items():
+			path = os.path.join(folder, file_name)
+			subprocess.run(
+				[
+					ffmpeg_path,
+					"-y",
+					"-loglevel",
+					"error",
+					"-f",
+					"lavfi",
+					"-i",
+					f"anoisesrc=d={seconds}:c=pink:a=0.1",
+					*codec_args,
+					path,
+				],
+				check=True,
+			)
+			paths.append(path)
+		return paths
+
+	@staticmethod
+	def __get_duration_seconds(pp: FFmpegExtractAudioPP, path: str) -> float:
+		return float(pp.get_metadata_object(path)["format"]["duration"])
+
+	@staticmethod
+	def __run(ydl: yt.YoutubeDL, source_path: str, preferred_codec: str, folder: str):
+		"""Runs the postprocessor on a copy of the source, returns cpu and wall seconds"""
+		file_name = os.path.basename(source_path)
+		path = os.path.join(folder, file_name)
+		shutil.copyfile(source_path, path)
+
+		pp = FFmpegExtractAudioPP(ydl, preferredcodec=preferred_codec)
+		information = {"filepath": path, "ext": os.path.splitext(file_name)[1].lstrip(".")}
+		cpu_start = AudioBenchmark.__get_child_cpu_seconds()
+		wall_start = time.perf_counter()
+		_, information = pp.run(information)
+		wall_seconds = time.perf_counter() - wall_start
+		cpu_seconds = AudioBenchmark.__get_child_cpu_seconds() - cpu_start
+
+		for output_name in os.listdir(folder):
+			os.remove(os.path.join(folder, output_name))
+		return cpu_seconds, wall_seconds
+
+	def start(self):
+		parser = argparse.ArgumentParser(
+			description="Audio postprocessing benchmark, CPU seconds per audio hour of each path",
+			epilog="Generates AAC and Opus sources if no paths passed, ffmpeg and ffprobe are required",
+		)
+		parser.add_argument(
+			"paths", metavar="<path>", nargs="*", help="Audio files, Ex: .m4a, .webm"
+		)
+		parser.add_argument(
+			"-g",
+			"--generate_seconds",
+			dest="generate_seconds",
+			type=int,
+			default=600,
+			help="Duration of generated sources",
+		)
+		parser.add_argument(
+			"-r", "--repeat", dest="repeat", type=int, default=3, help="Runs per file and path"
+		)
+		args = parser.parse_args()
+
+		with tempfile.TemporaryDirectory() as folder, yt.YoutubeDL({"quiet": True}) as ydl:
+			pp = FFmpegExtractAudioPP(ydl)
+			ffmpeg_path = pp.executable
+			if not pp.available or ffmpeg_path is None:
+				print("ffmpeg and ffprobe are required")
+				sys.exit(1)
+
+			source_folder = os.path.join(folder, "sources")
+			work_folder = os.path.join(folder, "work")
+			os.makedirs(source_folder)
+			os.makedirs(work_folder)
+			paths = args.paths or AudioBenchmark.__generate_sources(
+				ffmpeg_path, args.generate_seconds, source_folder
+			)
+
+			print(
+				f"{'file':<30} {'path':<6} {'audio sec':>10} {'cpu sec':>9} {'wall sec':>9} {'cpu sec/audio h':>16}"
+			)
+			for path in paths:
+				audio_hours = AudioBenchmark.__get_duration_seconds(pp, path) / 3600
+				for path_name, preferred_codec in AudioBenchmark.__paths.items():
+					runs = [
+						AudioBenchmark.__run(ydl, path, preferred_codec, work_folder)
+						for _ in range(args.repeat)
+					]
+					cpu_seconds = sum(cpu for cpu, _ in runs) / len(runs)
+					wall_seconds = sum(wall for _, wall in runs) / len(runs)
+					print(
+						f"{os.path.basename(path)[:30]:<30} {path_name:<6} "
+						f"{audio_hours * 3600:>10.1f} {cpu_seconds:>9.2f} {wall_seconds:>9.2f} "
+						f"{cpu_seconds / audio_hours:>16.1f}"
+					)
@@ -4,6 +4,7 @@ from dataclasses import field, dataclass
 
 from telegram_youtube_downloader.data.dl_format import DlFormat
 from telegram_youtube_downloader.statics.authorization_mode import AuthorizationMode
+from telegram_youtube_downloader.statics.search_backend_type import SearchBackendType
 from telegram_youtube_downloader.statics.default_command_type import DefaultCommandType
 
 
@@ -14,6 +15,7 @@ class LoggerOptions:
 	app_log_level: int
 	backup_count: int
 	max_bytes: int
+	trace_enabled: bool = True
 
 
 @dataclass
@@ -31,21 +33,64 @@ class AuthorizationOptions:
 	users: List[AuthorizationUser] = field(default_factory=list)
 
 
+@dataclass
+class ProgressOptions:
+	enabled: bool = True
+	chat_edit_interval_seconds: float = 3
+	max_edits_per_second: float = 10
+
+
+@dataclass
+class RateLimitOptions:
+	enabled: bool = True
+	global_rate_per_second: float = 25
+	chat_rate_per_second: float = 1
+	chat_burst: float = 3
+	max_retries: int = 3
+	max_retry_after_seconds: int = 60
+
+
+@dataclass
+class UploadRetryOptions:
+	max_attempts: int = 4
+	initial_backoff_seconds: float = 2
+	max_backoff_seconds: float = 60
+
+
 @dataclass
 class TelegramBotOptions:
 	text_timeout_seconds: int
 	video_timeout_seconds: int
 	audio_timeout_seconds: int
+	connect_timeout_seconds: int = 10
+	connection_pool_size: int = 10
 	base_url: Optional[str] = None
 	default_command: Optional[DefaultCommandType] = None
 	authorization_options: AuthorizationOptions = field(
 		default_factory=lambda: AuthorizationOptions(AuthorizationMode.DISABLED, [])
 	)
+	progress_options: ProgressOptions = field(default_factory=ProgressOptions)
+	rate_limit_options: RateLimitOptions = field(default_factory=RateLimitOptions)
+	upload_retry_options: UploadRetryOptions = field(default_factory=UploadRetryOptions)
+	# Parts of split media are uploaded here in parallel, then sent to the user in order
+	storage_chat_id: Optional[int] = None
+
+
+@dataclass
+class SearchCacheOptions:
+	max_size: int = 512
+	ttl_seconds: int = 3600
 
 
 @dataclass
 class YoutubeSearchOptions:
 	max_results: int
+	max_concurrent_searches: int = 4
+	timeout_seconds: int = 15
+	primary_backend: SearchBackendType = SearchBackendType.YOUTUBE_API
+	fallback_backend: Optional[SearchBackendType] = SearchBackendType.YT_DLP
+	quota_cooldown_seconds: int = 3600
+	search_cache_options: SearchCacheOptions = field(default_factory=SearchCacheOptions)
 
 
 @dataclass
@@ -67,6 +112,32 @@ class YoutubeFormats:
 		return []
 
 
+@dataclass
+class MetadataCacheOptions:
+	max_size: int = 256
+	ttl_seconds: int = 600
+	negative_ttl_seconds: int = 120
+
+
+@dataclass
+class AdmissionOptions:
+	enabled: bool = True
+	# None uses the Telegram limit, 50MB or 2000MB with a custom base_url
+	max_upload_bytes: Optional[int] = None
+	temp_space_factor: float = 2.0
+	storage_wait_seconds: int = 60
+	# Auto formats target this share of the upload limit, estimates are not exact
+	auto_format_size_ratio: float = 0.95
+
+
+@dataclass
+class SegmentOptions:
+	enabled: bool = False
+	max_parts: int = 20
+	# Parts target this share of the upload limit, cuts move to the next keyframe
+	part_size_ratio: float = 0.9
+
+
 @dataclass
 class YoutubeDownloaderOptions:
 	max_video_duration_seconds: int
@@ -75,6 +146,51 @@ class YoutubeDownloaderOptions:
 	video_options: dict = field(default_factory=dict)
 	allowed_url_patterns: List[AllowedUrlPattern] = field(default_factory=list)
 	formats: YoutubeFormats = field(default_factory=lambda: YoutubeFormats([], []))
+	metadata_cache_options: MetadataCacheOptions = field(default_factory=MetadataCacheOptions)
+	admission_options: AdmissionOptions = field(default_factory=AdmissionOptions)
+	segment_options: SegmentOptions = field(default_factory=SegmentOptions)
+
+
+@dataclass
+class StageOptions:
+	download_workers: int = 4
+	# 0 uses the cpu count
+	postprocess_workers: int = 0
+	upload_workers: int = 4
+	# 0 lets ffmpeg decide
+	ffmpeg_threads: int = 0
+	postprocess_niceness: int = 10
+
+
+@dataclass
+class DownloadQueueOptions:
+	max_queue_size: int
+	stage_options: StageOptions = field(default_factory=StageOptions)
+
+
+@dataclass
+class FileIdCacheOptions:
+	enabled: bool = True
+	db_path: str = "cache/file_id_cache.sqlite3"
+	max_entries: int = 10000
+
+
+@dataclass
+class TempStorageOptions:
+	audio_root: str = "temp"
+	video_root: str = "temp"
+	quota_bytes: int = 10737418240
+	audio_reservation_bytes: int = 104857600
+	video_reservation_bytes: int = 524288000
+	sweep_interval_seconds: int = 600
+	orphan_min_age_seconds: int = 21600
+
+
+@dataclass
+class MetricsOptions:
+	enabled: bool = False
+	host: str = "127.0.0.1"
+	port: int = 9464
 
 
 @dataclass
@@ -83,6 +199,12 @@ class AppConfig:
 	telegram_bot_options: TelegramBotOptions
 	youtube_search_options: YoutubeSearchOptions
 	youtube_downloader_options: YoutubeDownloaderOptions
+	download_queue_options: DownloadQueueOptions = field(
+		default_factory=lambda: DownloadQueueOptions(max_queue_size=20)
+	)
+	file_id_cache_options: FileIdCacheOptions = field(default_factory=FileIdCacheOptions)
+	temp_storage_options: TempStorageOptions = field(default_factory=TempStorageOptions)
+	metrics_options: MetricsOptions = field(default_factory=MetricsOptions)
 
 	def __str__(self) -> str:
 		return inspect.cleandoc(f""" \
@@ -97,5 +219,12 @@ class AppConfig:
 		    video_options={self.youtube_downloader_options.video_options}
 		    allowed_url_patterns={self.youtube_downloader_options.allowed_url_patterns}
 		    formats={self.youtube_downloader_options.formats}
+		    metadata_cache_options={self.youtube_downloader_options.metadata_cache_options}
+		    admission_options={self.youtube_downloader_options.admission_options}
+		    segment_options={self.youtube_downloader_options.segment_options}
 		  )
+		  download_queue_options={self.download_queue_options}
+		  file_id_cache_options={self.file_id_cache_options}
+		  temp_storage_options={self.temp_storage_options}
+		  metrics_options={self.metrics_options}
 		)""")
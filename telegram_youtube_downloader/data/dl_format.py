@@ -1,3 +1,4 @@
+from typing import Optional
 from dataclasses import dataclass
 
 
@@ -6,3 +7,7 @@ class DlFormat:
 	name: str
 	value: str
 	is_default: bool = False
+	# Picked from the metadata to fit the upload limit, value is used if nothing fits
+	is_auto: bool = False
+	# Overrides preferredcodec of FFmpegExtractAudio for this format, Ex: mp3
+	audio_codec: Optional[str] = None
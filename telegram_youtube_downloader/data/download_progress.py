@@ -0,0 +1,41 @@
+from typing import Any, Optional
+from dataclasses import dataclass
+
+from telegram_youtube_downloader.statics.download_stage import DownloadStage
+
+
+@dataclass
+class DownloadProgress:
+	"""Progress of a running download, built from yt_dlp progress and postprocessor hooks"""
+
+	stage: DownloadStage
+	downloaded_bytes: Optional[int] = None
+	total_bytes: Optional[int] = None
+	speed: Optional[float] = None
+	eta: Optional[int] = None
+	postprocessor: Optional[str] = None
+
+	@staticmethod
+	def from_hook_dict(d: dict[str, Any]) -> "Optional[DownloadProgress]":
+		"""Returns None for hook calls that do not change the progress"""
+		if "postprocessor" in d:
+			if d.get("status") != "started":
+				return None
+			return DownloadProgress(DownloadStage.PROCESSING, postprocessor=d["postprocessor"])
+
+		if d.get("status") == "finished":
+			return DownloadProgress(DownloadStage.PROCESSING)
+		if d.get("status") != "downloading":
+			return None
+		return DownloadProgress(
+			DownloadStage.DOWNLOADING,
+			downloaded_bytes=d.get("downloaded_bytes"),
+			total_bytes=d.get("total_bytes") or d.get("total_bytes_estimate"),
+			speed=d.get("speed"),
+			eta=d.get("eta"),
+		)
+
+	def get_percent(self) -> Optional[float]:
+		if not self.downloaded_bytes or not self.total_bytes:
+			return None
+		return min(100.0, self.downloaded_bytes / self.total_bytes * 100)
@@ -0,0 +1,14 @@
+from typing import Any
+from dataclasses import dataclass
+
+from telegram_youtube_downloader.storage_reservation import StorageReservation
+
+
+@dataclass
+class DownloadedMedia:
+	"""Downloaded media waiting for the postprocess stage, info is the yt_dlp info dict of the downloaded file"""
+
+	info: dict[str, Any]
+	options: dict[str, Any]
+	storage_reservation: StorageReservation
+	postprocess_path: str
@@ -0,0 +1,80 @@
+import re
+import copy
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+from dataclasses import dataclass
+
+from telegram_youtube_downloader.data.dl_format import DlFormat
+from telegram_youtube_downloader.data.app_config import YoutubeDownloaderOptions
+from telegram_youtube_downloader.statics.content_type import ContentType
+
+
+@dataclass(frozen=True)
+class DownloaderPlan:
+	"""
+	Immutable runtime form of YoutubeDownloaderOptions, compiled once when the config is loaded.
+	Url patterns, format lookups and base yt_dlp options are prepared so requests only do lookups.
+	"""
+
+	allowed_url_patterns: tuple[re.Pattern, ...]
+	formats: Mapping[ContentType, Mapping[str, DlFormat]]
+	default_formats: Mapping[ContentType, DlFormat]
+	base_options: Mapping[ContentType, Mapping[str, Any]]
+
+	@staticmethod
+	def __compile_url_patterns(options: YoutubeDownloaderOptions) -> tuple[re.Pattern, ...]:
+		"""Patterns are compiled separately, a single alternation would renumber their groups and break backreferences"""
+		return tuple(
+			re.compile(allowed_pattern.pattern) for allowed_pattern in options.allowed_url_patterns
+		)
+
+	@staticmethod
+	def compile(options: YoutubeDownloaderOptions) -> "DownloaderPlan":
+		formats = {}
+		default_formats = {}
+		for content_type in ContentType:
+			dl_formats = options.formats.from_string(content_type.value)
+			# First one wins on duplicate names, same as the previous linear search
+			formats[content_type] = MappingProxyType(
+				{dl_format.name: dl_format for dl_format in reversed(dl_formats)}
+			)
+			default_format = next((f for f in dl_formats if f.is_default), None)
+			if default_format is not None:
+				default_formats[content_type] = default_format
+
+		base_options = {
+			ContentType.AUDIO: MappingProxyType(
+				{
+					# Spread values from config file
+					**copy.deepcopy(options.audio_options),
+					# For custom downloader class
+					"content_type": ContentType.AUDIO,
+					"max_duration_seconds": options.max_audio_duration_seconds,
+				}
+			),
+			ContentType.VIDEO: MappingProxyType(
+				{
+					# Spread values from config file
+					**copy.deepcopy(options.video_options),
+					# For custom downloader class
+					"content_type": ContentType.VIDEO,
+					"max_duration_seconds": options.max_video_duration_seconds,
+				}
+			),
+		}
+
+		return DownloaderPlan(
+			allowed_url_patterns=DownloaderPlan.__compile_url_patterns(options),
+			formats=MappingProxyType(formats),
+			default_formats=MappingProxyType(default_formats),
+			base_options=MappingProxyType(base_options),
+		)
+
+	def is_allowed_url(self, url: str) -> bool:
+		return any(pattern.match(url) for pattern in self.allowed_url_patterns)
+
+	def get_format(self, content_type: ContentType, format_name: str) -> Optional[DlFormat]:
+		return self.formats[content_type].get(format_name)
+
+	def get_default_format(self, content_type: ContentType) -> Optional[DlFormat]:
+		return self.default_formats.get(content_type)
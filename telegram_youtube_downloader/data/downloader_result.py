@@ -1,7 +1,15 @@
-from dataclasses import dataclass
+from dataclasses import field, dataclass
+
+from telegram_youtube_downloader.data.media_info import MediaInfo
+from telegram_youtube_downloader.data.media_part import MediaPart
+from telegram_youtube_downloader.storage_reservation import StorageReservation
 
 
 @dataclass
 class DownloaderResult:
 	file_path: str
 	file_name: str
+	media_info: MediaInfo
+	storage_reservation: StorageReservation
+	# Set if the file is over the upload limit and was split
+	parts: list[MediaPart] = field(default_factory=list)
@@ -0,0 +1,21 @@
+from typing import Any, Optional
+from dataclasses import dataclass
+
+
+@dataclass
+class MediaInfo:
+	"""Slim projection of yt_dlp's info dict, only the fields used after download are kept"""
+
+	title: str
+	duration: Optional[float]
+	ext: str
+	filesize: Optional[int]
+
+	@staticmethod
+	def from_info_dict(meta: dict[str, Any]) -> "MediaInfo":
+		return MediaInfo(
+			title=meta.get("title") or "Unknown",
+			duration=meta.get("duration"),
+			ext=meta.get("ext") or "",
+			filesize=meta.get("filesize") or meta.get("filesize_approx"),
+		)
@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class MediaPart:
+	"""Piece of a file that is over the upload limit, parts are uploaded in order"""
+
+	file_path: str
+	file_name: str
+	filesize: int
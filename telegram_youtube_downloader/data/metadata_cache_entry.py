@@ -0,0 +1,9 @@
+from typing import Any, Optional
+from dataclasses import dataclass
+
+
+@dataclass
+class MetadataCacheEntry:
+	"""Cached extraction result"""
+
+	meta: Optional[dict[str, Any]] = None
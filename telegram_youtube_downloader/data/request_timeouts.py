@@ -0,0 +1,9 @@
+from typing import TypedDict
+
+
+class RequestTimeouts(TypedDict):
+	"""Timeout keyword arguments of the python-telegram-bot request methods"""
+
+	read_timeout: float
+	write_timeout: float
+	connect_timeout: float
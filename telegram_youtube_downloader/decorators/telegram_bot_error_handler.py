@@ -4,6 +4,7 @@ from typing import Callable, Awaitable
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from telegram_youtube_downloader.errors.queue_full_error import QueueFullError
 from telegram_youtube_downloader.errors.authorization_error import AuthorizationError
 
 
@@ -37,6 +38,19 @@ class TelegramBotErrorHandler:
 
 					await update.message.reply_text(str(ae))
 
+				# Download queue is full
+				except QueueFullError as qe:
+					TelegramBotErrorHandler.__logger.warning(
+						f"Update: {update} | Args: {context.args} | Error: {qe}"
+					)
+					if not update.message:
+						TelegramBotErrorHandler.__logger.error(
+							f"Cannot reply update: {update} | Args: {context.args}"
+						)
+						return
+
+					await update.message.reply_text(str(qe))
+
 				# Command usage error
 				except (IndexError, ValueError) as e:
 					TelegramBotErrorHandler.__logger.warning(
@@ -82,6 +96,16 @@ class TelegramBotErrorHandler:
 						f"Update: {update} | Args: {context.args}"
 					)
 					await func(*args, **kwargs)
+				except QueueFullError as qe:
+					TelegramBotErrorHandler.__logger.warning(
+						f"Update: {update} | Args: {context.args} | Error: {qe}"
+					)
+					if not update.callback_query:
+						TelegramBotErrorHandler.__logger.error(
+							f"Cannot reply update: {update} | Args: {context.args}"
+						)
+						return
+					await update.callback_query.edit_message_text(str(qe), reply_markup=None)
 				except:
 					TelegramBotErrorHandler.__logger.error(
 						f"Update: {update} | Args: {context.args}", exc_info=True
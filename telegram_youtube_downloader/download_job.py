@@ -0,0 +1,433 @@
+import math
+import time
+import asyncio
+import logging
+import datetime
+
+from telegram_youtube_downloader.job_trace import JobTrace
+from telegram_youtube_downloader.stage_slot import StageSlot
+from telegram_youtube_downloader.stage_pools import StagePools
+from telegram_youtube_downloader.file_id_store import FileIdStore
+from telegram_youtube_downloader.data.media_part import MediaPart
+from telegram_youtube_downloader.utils.size_utils import SizeUtils
+from telegram_youtube_downloader.errors.send_error import SendError
+from telegram_youtube_downloader.utils.config_utils import ConfigUtils
+from telegram_youtube_downloader.youtube_downloader import YoutubeDownloader
+from telegram_youtube_downloader.statics.metric_name import MetricName
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
+from telegram_youtube_downloader.statics.content_type import ContentType
+from telegram_youtube_downloader.errors.download_error import DownloadError
+from telegram_youtube_downloader.telegram_media_sender import TelegramMediaSender
+from telegram_youtube_downloader.data.download_progress import DownloadProgress
+from telegram_youtube_downloader.data.downloader_result import DownloaderResult
+from telegram_youtube_downloader.statics.download_stage import DownloadStage
+from telegram_youtube_downloader.errors.stale_file_id_error import StaleFileIdError
+
+
+class DownloadJob:
+	"""
+	Single download and send operation, executed by the DownloadScheduler workers.
+	The job starts with a download slot and releases it when the download ends, so it holds nothing while
+	it waits for the postprocess and upload pools. Everything else runs on the event loop.
+	Identical requests from other chats can be attached while the job is running, the file is
+	downloaded and uploaded once and its file id is resent to the other chats.
+	Each chat has one status message that is edited with the progress and the final result.
+	Files split into parts are sent as ordered albums, part file ids are not cached.
+	"""
+
+	# Telegram albums hold 2-10 files
+	__media_group_size = 10
+
+	def __init__(
+		self,
+		downloader: YoutubeDownloader,
+		media_sender: TelegramMediaSender,
+		file_id_store: FileIdStore,
+		url: str,
+		chat_id: int,
+		content_type: ContentType,
+		dl_format_name: "str | None",
+	) -> None:
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		self.__telegram_options = ConfigUtils.get_app_config().telegram_bot_options
+		self.__progress_options = self.__telegram_options.progress_options
+		self.downloader = downloader
+		self.media_sender = media_sender
+		self.file_id_store = file_id_store
+		self.url = url
+		self.chat_id = chat_id
+		self.content_type = content_type
+		self.dl_format_name = dl_format_name
+		self.__chat_ids = [chat_id]
+		self.__is_accepting_chats = True
+		self.__trace = JobTrace(url=url, content_type=content_type.value)
+		self.__icon = "🎧" if content_type == ContentType.AUDIO else "📽️"
+		# Chat id -> status message id, final status texts are kept for late attached messages
+		self.__status_messages: dict[int, int] = {}
+		self.__final_statuses: dict[int, str] = {}
+		# Set from the download thread, read by the progress reporter
+		self.__progress: "DownloadProgress | None" = None
+
+	def __get_key(self) -> "str | None":
+		"""Returns the job key, None if the url is not allowed so the cache can not bypass the url check"""
+		if not self.downloader.is_allowed_url(self.url):
+			return None
+		format_name = self.downloader.get_download_format_name(
+			self.content_type, self.dl_format_name
+		)
+		return FileIdStore.build_key(self.url, self.content_type, format_name)
+
+	def get_key(self) -> "str | None":
+		"""Key of identical jobs, None if the job can not be identified before it runs"""
+		try:
+			return self.__get_key()
+		except DownloadError:
+			return None
+
+	def add_chat(self, chat_id: int) -> bool:
+		"""Attaches another chat to this job, returns False if the job already delivered its media"""
+		if not self.__is_accepting_chats:
+			return False
+		if chat_id not in self.__chat_ids:
+			self.__chat_ids.append(chat_id)
+		return True
+
+	async def attach_status_message(self, chat_id: int, message_id: int) -> None:
+		"""Sets the message that is edited with the job status, applies the final status if the job already finished"""
+		self.__status_messages[chat_id] = message_id
+		final_status = self.__final_statuses.get(chat_id)
+		if final_status is not None:
+			await self.media_sender.edit_text(chat_id, message_id, final_status)
+
+	async def __set_status_to_all(self, text: str) -> None:
+		for chat_id, message_id in list(self.__status_messages.items()):
+			await self.media_sender.edit_text(chat_id, message_id, text)
+
+	async def __finish(self, chat_id: int, text: str) -> None:
+		"""Sets the final status of a chat, tries to answer on error"""
+		self.__final_statuses[chat_id] = text
+		message_id = self.__status_messages.get(chat_id)
+		if message_id is None:
+			return
+		try:
+			await self.media_sender.edit_text(chat_id, message_id, text)
+		except Exception:
+			self.__logger.error(
+				f"User notifying attempt (via message edit) failed due to another error, {text}",
+				exc_info=True,
+			)
+
+	async def __finish_all(self, text: str) -> None:
+		"""Sets the final status of chats that do not have one yet"""
+		for chat_id in self.__chat_ids:
+			if chat_id not in self.__final_statuses:
+				await self.__finish(chat_id, text)
+
+	def __get_progress_text(self, progress: DownloadProgress) -> str:
+		"""Ex: ⬇️🎧 Downloading 45.3% (2.1MiB/s, ETA 0:00:12)"""
+		if progress.stage == DownloadStage.PROCESSING:
+			postprocessor = f" ({progress.postprocessor})" if progress.postprocessor else ""
+			return f"⚙️{self.__icon} Processing{postprocessor}..."
+
+		details = []
+		if progress.speed:
+			details.append(f"{SizeUtils.format_bytes(progress.speed)}/s")
+		if progress.eta is not None:
+			details.append(f"ETA {datetime.timedelta(seconds=int(progress.eta))}")
+		percent = progress.get_percent()
+		percent_text = f" {percent:.1f}%" if percent is not None else ""
+		details_text = f" ({', '.join(details)})" if details else ""
+		return f"⬇️{self.__icon} Downloading{percent_text}{details_text}"
+
+	def __on_progress(self, progress: DownloadProgress) -> None:
+		"""Called from the download thread, only keeps the latest progress"""
+		self.__progress = progress
+
+	async def __report_progress(self) -> None:
+		"""Edits the status messages with the latest progress until cancelled, edits are throttled by the sender"""
+		reported_text = None
+		while True:
+			await asyncio.sleep(self.__progress_options.chat_edit_interval_seconds)
+			progress = self.__progress
+			if progress is None:
+				continue
+			text = self.__get_progress_text(progress)
+			if text == reported_text:
+				continue
+			reported_text = text
+			for chat_id, message_id in list(self.__status_messages.items()):
+				await self.media_sender.edit_text(chat_id, message_id, text, is_progress=True)
+
+	async def __send_by_file_id(self, chat_id: int, file_id: str) -> None:
+		if self.content_type == ContentType.AUDIO:
+			await self.media_sender.send_audio_by_file_id(chat_id, file_id)
+		else:
+			await self.media_sender.send_video_by_file_id(chat_id, file_id)
+
+	async def __send_file(self, chat_id: int, file_path: str, file_name: str) -> "str | None":
+		if self.content_type == ContentType.AUDIO:
+			return await self.media_sender.send_audio(
+				chat_id=chat_id, file_path=file_path, file_name=file_name
+			)
+		return await self.media_sender.send_video(
+			chat_id=chat_id, file_path=file_path, file_name=file_name
+		)
+
+	async def __upload(
+		self, stage_pools: StagePools, chat_id: int, result: DownloaderResult
+	) -> "str | None":
+		async with stage_pools.upload_slot():
+			upload_start = time.time()
+			with self.__trace.span("upload", chat_id=chat_id, bytes=result.media_info.filesize):
+				file_id = await self.__send_file(chat_id, result.file_path, result.file_name)
+
+		MetricsUtils.observe(
+			MetricName.STAGE_DURATION_SECONDS, time.time() - upload_start, {"stage": "upload"}
+		)
+		MetricsUtils.inc(
+			MetricName.UPLOADED_BYTES_TOTAL,
+			result.media_info.filesize or 0,
+			{"content_type": self.content_type.value},
+		)
+		return file_id
+
+	@staticmethod
+	def __group_parts(parts: list[MediaPart]) -> list[list[MediaPart]]:
+		"""Splits parts into albums of even size in order, so no album is left with a single part when possible"""
+		group_count = math.ceil(len(parts) / DownloadJob.__media_group_size)
+		groups = []
+		start = 0
+		for index in range(group_count):
+			size = len(parts) // group_count + (1 if index < len(parts) % group_count else 0)
+			groups.append(parts[start : start + size])
+			start += size
+		return groups
+
+	async def __send_parts_by_file_ids(
+		self, chat_id: int, parts: list[MediaPart], file_ids: list[str]
+	) -> None:
+		"""Resends uploaded parts in order, albums are sent one after another"""
+		start = 0
+		for group in DownloadJob.__group_parts(parts):
+			group_file_ids = file_ids[start : start + len(group)]
+			start += len(group)
+			if len(group) == 1:
+				await self.__send_by_file_id(chat_id, group_file_ids[0])
+			else:
+				await self.media_sender.send_media_group_by_file_ids(
+					chat_id,
+					self.content_type,
+					group_file_ids,
+					[part.file_name for part in group],
+				)
+
+	async def __upload_part(self, stage_pools: StagePools, chat_id: int, part: MediaPart) -> str:
+		async with stage_pools.upload_slot():
+			file_id = await self.__send_file(chat_id, part.file_path, part.file_name)
+		if file_id is None:
+			raise SendError("Could not send parts, Telegram did not return a file id")
+		return file_id
+
+	async def __upload_parts(
+		self, stage_pools: StagePools, chat_id: int, result: DownloaderResult
+	) -> "list[str] | None":
+		"""
+		Parts are uploaded to the storage chat in parallel and resent in order if it is set.
+		Otherwise albums are uploaded to the chat one by one, so they arrive in order.
+		Returns None if Telegram did not return a file id for every part.
+		"""
+		parts = result.parts
+		storage_chat_id = self.__telegram_options.storage_chat_id
+		upload_start = time.time()
+		with self.__trace.span(
+			"upload",
+			chat_id=chat_id,
+			bytes=sum(part.filesize for part in parts),
+			parts=len(parts),
+		):
+			file_ids: "list[str | None]" = []
+			if storage_chat_id is not None:
+				stored_file_ids = await asyncio.gather(
+					*(self.__upload_part(stage_pools, storage_chat_id, part) for part in parts)
+				)
+				await self.__send_parts_by_file_ids(chat_id, parts, list(stored_file_ids))
+				file_ids += stored_file_ids
+			else:
+				for group in DownloadJob.__group_parts(parts):
+					async with stage_pools.upload_slot():
+						if len(group) == 1:
+							file_ids.append(
+								await self.__send_file(
+									chat_id, group[0].file_path, group[0].file_name
+								)
+							)
+						else:
+							file_ids += await self.media_sender.send_media_group(
+								chat_id, self.content_type, group
+							)
+
+		MetricsUtils.observe(
+			MetricName.STAGE_DURATION_SECONDS, time.time() - upload_start, {"stage": "upload"}
+		)
+		MetricsUtils.inc(
+			MetricName.UPLOADED_BYTES_TOTAL,
+			sum(part.filesize for part in parts),
+			{"content_type": self.content_type.value},
+		)
+		if any(file_id is None for file_id in file_ids):
+			return None
+		return [file_id for file_id in file_ids if file_id is not None]
+
+	async def __send_cached(self, key: str) -> bool:
+		"""
+		Resends media by its cached file id, file ids rejected by telegram are removed and False is returned.
+		Other send errors are raised and keep the entry. The store is used from a thread, sqlite commits block.
+		"""
+		file_id = await asyncio.to_thread(self.file_id_store.get, key)
+		if file_id is None:
+			return False
+
+		try:
+			with self.__trace.span("send_cached", chat_id=self.__chat_ids[0]):
+				await self.__send_by_file_id(self.__chat_ids[0], file_id)
+		except StaleFileIdError:
+			self.__logger.warning(f"Cached file id for '{key}' is stale, downloading again")
+			await asyncio.to_thread(self.file_id_store.delete, key)
+			return False
+
+		await self.__deliver(file_id, None)
+		return True
+
+	async def __deliver(
+		self,
+		file_id: "str | None",
+		result: "DownloaderResult | None",
+		stage_pools: "StagePools | None" = None,
+		part_file_ids: "list[str] | None" = None,
+	) -> None:
+		"""
+		Sends media to the other chats, chats attached meanwhile are included.
+		File id is resent when available, otherwise the downloaded file is uploaded again.
+		"""
+		index = 1
+		while index < len(self.__chat_ids):
+			chat_id = self.__chat_ids[index]
+			index += 1
+			try:
+				if result is not None and result.parts:
+					if part_file_ids is not None:
+						await self.__send_parts_by_file_ids(chat_id, result.parts, part_file_ids)
+					elif stage_pools is not None:
+						part_file_ids = await self.__upload_parts(stage_pools, chat_id, result)
+				elif file_id is not None:
+					await self.__send_by_file_id(chat_id, file_id)
+				elif result is not None and stage_pools is not None:
+					file_id = await self.__upload(stage_pools, chat_id, result)
+			except SendError as se:
+				MetricsUtils.inc(MetricName.ERRORS_TOTAL, labels={"type": type(se).__name__})
+				await self.__finish(chat_id, f"💩 {str(se)}")
+
+		# No await between the last check and this, so no chat can be attached without delivery
+		self.__is_accepting_chats = False
+		await self.__finish_all(f"🥳{self.__icon} Done")
+
+	async def __download(
+		self, stage_pools: StagePools, download_slot: StageSlot
+	) -> DownloaderResult:
+		"""The download slot is freed for the next job before waiting for the postprocess pool"""
+		on_progress = self.__on_progress if self.__progress_options.enabled else None
+		try:
+			downloaded = await stage_pools.run_download(
+				self.downloader.download,
+				self.url,
+				self.content_type,
+				self.dl_format_name,
+				self.__trace,
+				on_progress,
+			)
+		finally:
+			download_slot.release()
+		return await stage_pools.run_postprocess(
+			self.downloader.postprocess, downloaded, self.__trace, on_progress
+		)
+
+	async def __run_download(self, stage_pools: StagePools, download_slot: StageSlot) -> None:
+		"""Downloads once, uploads to the first chat and resends the file id to the others"""
+		download_start = time.time()
+		progress_reporter = None
+		if self.__progress_options.enabled:
+			progress_reporter = asyncio.create_task(self.__report_progress())
+		try:
+			result = await self.__download(stage_pools, download_slot)
+		finally:
+			if progress_reporter is not None:
+				progress_reporter.cancel()
+		self.__logger.info(
+			f"Download completed {result}, took {float(time.time() - download_start):.3f} seconds"
+		)
+
+		try:
+			upload_start = time.time()
+			if result.parts:
+				await self.__set_status_to_all(
+					f"⬆️{self.__icon} Sending {len(result.parts)} parts..."
+				)
+				file_id = None
+				part_file_ids = await self.__upload_parts(stage_pools, self.__chat_ids[0], result)
+			else:
+				await self.__set_status_to_all(f"⬆️{self.__icon} Sending...")
+				file_id = await self.__upload(stage_pools, self.__chat_ids[0], result)
+				part_file_ids = None
+			self.__logger.info(
+				f"Upload completed, took {float(time.time() - upload_start):.3f} seconds"
+			)
+
+			# Stored before delivery, identical requests after the job stops accepting chats resend it
+			key = self.__get_key()
+			if key is not None and file_id is not None:
+				await asyncio.to_thread(self.file_id_store.set, key, file_id)
+
+			await self.__deliver(file_id, result, stage_pools, part_file_ids)
+
+		finally:
+			result.storage_reservation.release()
+
+		self.__logger.info(
+			f"Total operation took {float(time.time() - download_start):.3f} seconds"
+		)
+
+	async def run(self, stage_pools: StagePools, download_slot: StageSlot) -> None:
+		"""Runs the job, the whole job is traced as the 'job' span. The download slot is always released."""
+		self.__logger.info(f"Download started for url {self.url}, trace id {self.__trace.trace_id}")
+
+		try:
+			with self.__trace.span("job", format_name=self.dl_format_name) as attributes:
+				await self.__run(stage_pools, download_slot, attributes)
+		finally:
+			download_slot.release()
+
+	async def __run(
+		self, stage_pools: StagePools, download_slot: StageSlot, trace_attributes: dict
+	) -> None:
+		try:
+			key = self.__get_key()
+			if key is not None and await self.__send_cached(key):
+				self.__logger.info(f"Sent from file id cache '{key}'")
+				trace_attributes["result"] = "cached"
+				return
+
+			await self.__run_download(stage_pools, download_slot)
+			trace_attributes["result"] = "downloaded"
+
+		except (DownloadError, SendError) as e:
+			self.__logger.warning(str(e))
+			MetricsUtils.inc(MetricName.ERRORS_TOTAL, labels={"type": type(e).__name__})
+			trace_attributes["result"] = type(e).__name__
+			self.__is_accepting_chats = False
+			await self.__finish_all(f"💩 {str(e)}")
+		except Exception:
+			self.__logger.error("Unknown error", exc_info=True)
+			MetricsUtils.inc(MetricName.ERRORS_TOTAL, labels={"type": "Unknown"})
+			trace_attributes["result"] = "Unknown"
+			self.__is_accepting_chats = False
+			await self.__finish_all("🤷🏻‍♂️ Unknown error")
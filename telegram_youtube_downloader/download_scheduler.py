@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from collections import deque
+
+from telegram_youtube_downloader.stage_slot import StageSlot
+from telegram_youtube_downloader.stage_pools import StagePools
+from telegram_youtube_downloader.download_job import DownloadJob
+from telegram_youtube_downloader.utils.config_utils import ConfigUtils
+from telegram_youtube_downloader.statics.metric_name import MetricName
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
+from telegram_youtube_downloader.errors.queue_full_error import QueueFullError
+
+
+class DownloadScheduler:
+	"""
+	Starts download jobs as asyncio tasks from a bounded waiting queue.
+	A queued job starts as soon as the download stage has a free slot, it frees the slot when its download ends
+	and waits for the postprocess and upload pools on its own, so a burst in one stage does not hold the others.
+	"""
+
+	def __init__(self) -> None:
+		self.__queue_options = ConfigUtils.get_app_config().download_queue_options
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		# Jobs waiting for a download slot with their keys, oldest first
+		self.__queue: deque[tuple[DownloadJob, str | None]] = deque()
+		self.__job_queued = asyncio.Event()
+		# Queued or running jobs by key, identical requests are attached to these
+		self.__in_flight: dict[str, DownloadJob] = {}
+		self.__running_jobs: set[asyncio.Task] = set()
+		self.__dispatcher: "asyncio.Task | None" = None
+		self.__stage_pools = StagePools()
+		MetricsUtils.register_collector(
+			MetricName.QUEUE_DEPTH, lambda: [({}, self.get_queue_size())]
+		)
+		MetricsUtils.register_collector(
+			MetricName.ACTIVE_JOBS, lambda: [({}, self.get_active_job_count())]
+		)
+
+	async def __run(self, job: DownloadJob, key: "str | None", download_slot: StageSlot) -> None:
+		try:
+			await job.run(self.__stage_pools, download_slot)
+		except Exception:
+			# Jobs handle their own errors, this is a last resort to keep the scheduler going
+			self.__logger.error("Unknown error", exc_info=True)
+		finally:
+			if key is not None and self.__in_flight.get(key) is job:
+				del self.__in_flight[key]
+
+	async def __dispatch(self) -> None:
+		"""Starts the oldest queued job whenever a download slot is free"""
+		while True:
+			while not self.__queue:
+				self.__job_queued.clear()
+				await self.__job_queued.wait()
+
+			download_slot = await self.__stage_pools.acquire_download_slot()
+			# Only the dispatcher takes jobs, so the queue is not empty here
+			job, key = self.__queue.popleft()
+			task = asyncio.create_task(self.__run(job, key, download_slot))
+			self.__running_jobs.add(task)
+			task.add_done_callback(self.__running_jobs.discard)
+
+	async def start(self) -> None:
+		"""Starts the dispatcher task, must be called from the running event loop"""
+		self.__logger.info(
+			f"Starting download scheduler, max queue size {self.__queue_options.max_queue_size}"
+		)
+		self.__dispatcher = asyncio.create_task(self.__dispatch(), name="JobDispatcher")
+
+	async def stop(self) -> None:
+		"""Cancels the dispatcher and running jobs, downloads already running on the stage pools are not waited"""
+		tasks = list(self.__running_jobs)
+		if self.__dispatcher is not None:
+			tasks.append(self.__dispatcher)
+			self.__dispatcher = None
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+		self.__stage_pools.shutdown()
+
+	def __get_position(self, queue_index: int) -> int:
+		"""Position of a queued job, 0 means it starts right away"""
+		return max(0, queue_index + 1 - self.__stage_pools.get_free_download_slots())
+
+	def __get_queued_job_position(self, job: DownloadJob) -> int:
+		"""Position of a job that is still queued, 0 if it is already running"""
+		for queue_index, (queued_job, _) in enumerate(self.__queue):
+			if queued_job is job:
+				return self.__get_position(queue_index)
+		return 0
+
+	def submit(self, job: DownloadJob) -> tuple[int, DownloadJob]:
+		"""
+		Queues a job and returns its position in the queue with the job that will serve the chat.
+		Position 0 means a free download slot will pick it up right away.
+		If an identical job is already queued or running the chat is attached to it instead, this returns the position of
+		that job (0 if it is running) and that job.
+		Raises QueueFullError if the queue is full.
+		"""
+		key = job.get_key()
+		if key is not None:
+			in_flight_job = self.__in_flight.get(key)
+			if in_flight_job is not None and in_flight_job.add_chat(job.chat_id):
+				position = self.__get_queued_job_position(in_flight_job)
+				self.__logger.info(
+					f"Chat {job.chat_id} attached to the in flight job '{key}' at position {position}"
+				)
+				return position, in_flight_job
+
+		if len(self.__queue) >= self.__queue_options.max_queue_size:
+			self.__logger.warning(f"Download queue is full, rejecting job for url {job.url}")
+			raise QueueFullError("🚦 Bot is busy right now, please try again later")
+
+		self.__queue.append((job, key))
+		self.__job_queued.set()
+		if key is not None:
+			self.__in_flight[key] = job
+
+		position = self.__get_position(len(self.__queue) - 1)
+		self.__logger.info(f"Job for url {job.url} queued at position {position}")
+		return position, job
+
+	def get_queue_size(self) -> int:
+		return len(self.__queue)
+
+	def get_active_job_count(self) -> int:
+		return len(self.__running_jobs)
@@ -0,0 +1,3 @@
+class QueueFullError(Exception):
+	def __init__(self, msg="Download queue is full", *args, **kwargs):
+		super().__init__(msg, *args, **kwargs)
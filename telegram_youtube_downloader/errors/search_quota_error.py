@@ -0,0 +1,6 @@
+from telegram_youtube_downloader.errors.search_error import SearchError
+
+
+class SearchQuotaError(SearchError):
+	def __init__(self, msg="Search quota exceeded", *args, **kwargs):
+		super().__init__(msg, *args, **kwargs)
@@ -0,0 +1,6 @@
+from telegram_youtube_downloader.errors.send_error import SendError
+
+
+class StaleFileIdError(SendError):
+	def __init__(self, msg="Telegram rejected the file id", *args, **kwargs):
+		super().__init__(msg, *args, **kwargs)
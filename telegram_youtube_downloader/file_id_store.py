@@ -0,0 +1,106 @@
+import os
+import time
+import logging
+import pathlib
+import sqlite3
+import threading
+
+from telegram_youtube_downloader.utils.url_utils import UrlUtils
+from telegram_youtube_downloader.utils.config_utils import ConfigUtils
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
+from telegram_youtube_downloader.statics.content_type import ContentType
+
+
+class FileIdStore:
+	"""
+	Persistent index of telegram file ids of already sent media, backed by sqlite.
+	Repeated requests are answered by resending the file id without downloading or uploading again.
+	"""
+
+	def __init__(self) -> None:
+		self.__cache_options = ConfigUtils.get_app_config().file_id_cache_options
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		self.__lock = threading.Lock()
+		self.__connection: "sqlite3.Connection | None" = None
+		self.__hits = 0
+		self.__misses = 0
+		MetricsUtils.register_cache("file_id", self.get_stats)
+
+		if self.__cache_options.enabled:
+			self.__connection = self.__connect()
+
+	def __connect(self) -> sqlite3.Connection:
+		db_path = self.__cache_options.db_path
+		if not os.path.isabs(db_path):
+			db_path = os.path.join(os.getcwd(), db_path)
+		pathlib.Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+		self.__logger.info(f"Using file id cache at {db_path}")
+		connection = sqlite3.connect(db_path, check_same_thread=False)
+		connection.execute(
+			"""CREATE TABLE IF NOT EXISTS file_ids (
+				key TEXT PRIMARY KEY,
+				file_id TEXT NOT NULL,
+				created_at REAL NOT NULL,
+				last_used_at REAL NOT NULL
+			)"""
+		)
+		connection.execute(
+			"CREATE INDEX IF NOT EXISTS file_ids_last_used_at ON file_ids (last_used_at)"
+		)
+		connection.commit()
+		return connection
+
+	@staticmethod
+	def build_key(url: str, content_type: ContentType, format_name: str) -> str:
+		return f"{UrlUtils.normalize_url(url)}|{content_type.value}|{format_name}"
+
+	def get(self, key: str) -> "str | None":
+		"""Returns the file id for the key and marks it as recently used"""
+		if self.__connection is None:
+			return None
+
+		with self.__lock:
+			row = self.__connection.execute(
+				"SELECT file_id FROM file_ids WHERE key = ?", (key,)
+			).fetchone()
+			if row is None:
+				self.__misses += 1
+				return None
+			self.__hits += 1
+			self.__connection.execute(
+				"UPDATE file_ids SET last_used_at = ? WHERE key = ?", (time.time(), key)
+			)
+			self.__connection.commit()
+			return row[0]
+
+	def set(self, key: str, file_id: str) -> None:
+		"""Stores a file id, least recently used entries over max_entries are evicted"""
+		if self.__connection is None:
+			return
+
+		now = time.time()
+		with self.__lock:
+			self.__connection.execute(
+				"INSERT OR REPLACE INTO file_ids (key, file_id, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+				(key, file_id, now, now),
+			)
+			self.__connection.execute(
+				"""DELETE FROM file_ids WHERE key IN (
+					SELECT key FROM file_ids ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+				)""",
+				(self.__cache_options.max_entries,),
+			)
+			self.__connection.commit()
+
+	def delete(self, key: str) -> None:
+		"""Removes a stale file id"""
+		if self.__connection is None:
+			return
+
+		with self.__lock:
+			self.__connection.execute("DELETE FROM file_ids WHERE key = ?", (key,))
+			self.__connection.commit()
+
+	def get_stats(self) -> dict[str, int]:
+		return {"hits": self.__hits, "misses": self.__misses}
@@ -0,0 +1,49 @@
+import json
+import time
+import uuid
+import logging
+from typing import Any, Iterator
+from contextlib import contextmanager
+
+
+class JobTrace:
+	"""
+	Timed spans of a single download job, written as JSONL records to the trace log.
+	Spans can be recorded from any thread, records of the same job share the trace id.
+	"""
+
+	TRACE_LOGGER_NAME = "tyd_trace"
+
+	def __init__(self, **attributes: Any) -> None:
+		self.trace_id = uuid.uuid4().hex
+		self.__attributes = attributes
+		self.__trace_logger = logging.getLogger(JobTrace.TRACE_LOGGER_NAME)
+
+	def add_span(
+		self, name: str, start: float, end: float, status: str = "ok", **attributes: Any
+	) -> None:
+		"""Writes a span that was timed by the caller, start and end are epoch seconds"""
+		if not self.__trace_logger.isEnabledFor(logging.INFO):
+			return
+
+		record = {
+			"trace_id": self.trace_id,
+			"span": name,
+			"start": round(start, 6),
+			"duration_seconds": round(end - start, 6),
+			"status": status,
+			**self.__attributes,
+			**attributes,
+		}
+		self.__trace_logger.info(json.dumps(record, default=str, ensure_ascii=False))
+
+	@contextmanager
+	def span(self, name: str, **attributes: Any) -> Iterator[dict[str, Any]]:
+		"""Times the block, attributes can be added to the yielded dict inside the block"""
+		start = time.time()
+		try:
+			yield attributes
+		except BaseException as e:
+			self.add_span(name, start, time.time(), "error", error=type(e).__name__, **attributes)
+			raise
+		self.add_span(name, start, time.time(), **attributes)
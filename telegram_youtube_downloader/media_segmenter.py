@@ -0,0 +1,151 @@
+import os
+import math
+import shutil
+import logging
+import subprocess
+from typing import Any
+
+from telegram_youtube_downloader.utils.size_utils import SizeUtils
+from telegram_youtube_downloader.utils.config_utils import ConfigUtils
+from telegram_youtube_downloader.statics.content_type import ContentType
+from telegram_youtube_downloader.errors.download_error import DownloadError
+
+
+class MediaSegmenter:
+	"""
+	Splits files over the upload limit into ordered parts with the ffmpeg segment muxer.
+	Streams are copied, so video is cut on the first keyframe after each cut time.
+	Audio is cut on chapter boundaries if the chapters fit the part size, else into equal durations.
+	"""
+
+	def __init__(self) -> None:
+		self.__segment_options = (
+			ConfigUtils.get_app_config().youtube_downloader_options.segment_options
+		)
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+
+	@staticmethod
+	def __get_equal_cut_times(duration: float, part_count: int) -> list[float]:
+		return [duration * i / part_count for i in range(1, part_count)]
+
+	@staticmethod
+	def __get_chapter_cut_times(
+		chapters: list[dict[str, Any]], duration: float, filesize: int, max_part_bytes: float
+	) -> "list[float] | None":
+		"""
+		Groups consecutive chapters while their estimated size fits max_part_bytes.
+		Size is estimated from the average bitrate, returns None if a chapter alone does not fit.
+		"""
+		bytes_per_second = filesize / duration
+		boundaries = sorted(
+			float(chapter["start_time"])
+			for chapter in chapters
+			if 0 < (chapter.get("start_time") or 0) < duration
+		)
+
+		cut_times: list[float] = []
+		part_start = 0.0
+		previous_boundary = 0.0
+		for boundary in [*boundaries, duration]:
+			if (boundary - part_start) * bytes_per_second > max_part_bytes:
+				if previous_boundary <= part_start:
+					return None
+				cut_times.append(previous_boundary)
+				part_start = previous_boundary
+				if (boundary - part_start) * bytes_per_second > max_part_bytes:
+					return None
+			previous_boundary = boundary
+		return cut_times
+
+	def __split(
+		self, ffmpeg_path: str, file_path: str, cut_times: list[float], folder: str
+	) -> list[str]:
+		"""Returns part paths in order, the folder is emptied first"""
+		shutil.rmtree(folder, ignore_errors=True)
+		os.makedirs(folder)
+
+		extension = os.path.splitext(file_path)[1]
+		command = [
+			ffmpeg_path,
+			"-y",
+			"-loglevel",
+			"error",
+			"-i",
+			file_path,
+			"-map",
+			"0:v?",
+			"-map",
+			"0:a?",
+			"-c",
+			"copy",
+			"-f",
+			"segment",
+			"-segment_times",
+			",".join(f"{cut_time:.3f}" for cut_time in cut_times),
+			"-reset_timestamps",
+			"1",
+		]
+		# Parts can be played while they are downloaded by the Telegram clients
+		if extension in (".mp4", ".m4a"):
+			command += ["-segment_format_options", "movflags=+faststart"]
+		command.append(os.path.join(folder, f"part%03d{extension}"))
+
+		try:
+			subprocess.run(command, check=True, capture_output=True)
+		except subprocess.CalledProcessError as cpe:
+			self.__logger.error(f"ffmpeg cannot split '{file_path}': {cpe.stderr!r}")
+			raise DownloadError("Cannot split the file")
+
+		return [os.path.join(folder, file_name) for file_name in sorted(os.listdir(folder))]
+
+	def segment(
+		self,
+		ffmpeg_path: str,
+		file_path: str,
+		info: dict[str, Any],
+		content_type: ContentType,
+		max_part_bytes: int,
+	) -> list[str]:
+		"""
+		Splits the file into parts of at most max_part_bytes, parts are written next to the file.
+		Keyframes can make parts bigger than planned, the file is split again into more parts if so.
+		Raises DownloadError if it does not fit max_parts.
+		"""
+		max_parts = self.__segment_options.max_parts
+		filesize = os.path.getsize(file_path)
+		duration = info.get("duration")
+		if not duration:
+			raise DownloadError("Cannot split the file, duration is unknown")
+
+		target_part_bytes = max_part_bytes * self.__segment_options.part_size_ratio
+		part_count = math.ceil(filesize / target_part_bytes)
+		too_big_error = f"File is too big to send even in {max_parts} parts, {SizeUtils.format_bytes(filesize)} and the part limit is {SizeUtils.format_bytes(max_part_bytes)}, try a lower quality format"
+		if part_count > max_parts:
+			raise DownloadError(too_big_error)
+
+		cut_times = None
+		chapters = info.get("chapters")
+		if content_type == ContentType.AUDIO and chapters:
+			cut_times = MediaSegmenter.__get_chapter_cut_times(
+				chapters, duration, filesize, target_part_bytes
+			)
+			if cut_times is not None and len(cut_times) + 1 > max_parts:
+				cut_times = None
+		if cut_times is None:
+			cut_times = MediaSegmenter.__get_equal_cut_times(duration, part_count)
+
+		folder = os.path.join(os.path.dirname(file_path), "parts")
+		while True:
+			part_paths = self.__split(ffmpeg_path, file_path, cut_times, folder)
+			largest_part_bytes = max(os.path.getsize(part_path) for part_path in part_paths)
+			if largest_part_bytes <= max_part_bytes:
+				self.__logger.info(f"Split '{file_path}' into {len(part_paths)} parts")
+				return part_paths
+
+			part_count = max(part_count, len(part_paths)) + 1
+			if part_count > max_parts:
+				raise DownloadError(too_big_error)
+			self.__logger.info(
+				f"A part is {SizeUtils.format_bytes(largest_part_bytes)} after cutting on keyframes, splitting into {part_count} parts"
+			)
+			cut_times = MediaSegmenter.__get_equal_cut_times(duration, part_count)
@@ -0,0 +1,54 @@
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from telegram_youtube_downloader.utils.config_utils import ConfigUtils
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+	def do_GET(self) -> None:
+		if self.path.split("?")[0] != "/metrics":
+			self.send_error(404)
+			return
+
+		body = MetricsUtils.render().encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args) -> None:
+		"""Scrapes are not logged"""
+		pass
+
+
+class MetricsServer:
+	"""Serves /metrics on its own daemon thread, so scrapes never touch the bot's event loop"""
+
+	def __init__(self) -> None:
+		self.__metrics_options = ConfigUtils.get_app_config().metrics_options
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		self.__server: "ThreadingHTTPServer | None" = None
+
+	def start(self) -> None:
+		if not self.__metrics_options.enabled:
+			return
+
+		MetricsUtils.enable()
+		host = self.__metrics_options.host
+		port = self.__metrics_options.port
+		self.__server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+		self.__server.daemon_threads = True
+		threading.Thread(
+			target=self.__server.serve_forever, name="MetricsServer", daemon=True
+		).start()
+		self.__logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+	def stop(self) -> None:
+		if self.__server is None:
+			return
+		self.__server.shutdown()
+		self.__server.server_close()
+		self.__server = None
@@ -0,0 +1,23 @@
+from abc import ABC, abstractmethod
+
+from telegram_youtube_downloader.statics.search_backend_type import SearchBackendType
+
+
+class SearchBackend(ABC):
+	"""
+	Search implementation used by YoutubeSearcher, called from the search executor threads.
+	Results are dicts with 'title', 'url' and 'duration' keys.
+	"""
+
+	@abstractmethod
+	def get_type(self) -> SearchBackendType:
+		pass
+
+	@abstractmethod
+	def is_available(self) -> bool:
+		pass
+
+	@abstractmethod
+	def search(self, query: str, max_results: int) -> list[dict[str, str]]:
+		"""Raises SearchQuotaError when the backend is out of quota, SearchError on other errors"""
+		pass
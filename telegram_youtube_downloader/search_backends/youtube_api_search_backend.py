@@ -0,0 +1,108 @@
+import logging
+import threading
+
+import isodate
+import httplib2
+from googleapiclient.errors import HttpError
+from googleapiclient.discovery import build
+
+from telegram_youtube_downloader.errors.search_error import SearchError
+from telegram_youtube_downloader.errors.search_quota_error import SearchQuotaError
+from telegram_youtube_downloader.statics.search_backend_type import SearchBackendType
+from telegram_youtube_downloader.search_backends.search_backend import SearchBackend
+
+
+class YoutubeApiSearchBackend(SearchBackend):
+	"""Searches with the YouTube Data API, costs 101 quota units per search"""
+
+	__quota_error_reasons = {"quotaExceeded", "dailyLimitExceeded", "rateLimitExceeded"}
+
+	def __init__(self, api_key: "str | None", timeout_seconds: int) -> None:
+		self.__api_key = api_key
+		self.__timeout_seconds = timeout_seconds
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		self.__youtube_url_base = "https://www.youtube.com/watch?v="
+		# httplib2 is not thread safe, each search thread gets its own client
+		self.__thread_local = threading.local()
+
+	def __get_youtube(self):
+		"""Returns the youtube client of the current thread"""
+		youtube = getattr(self.__thread_local, "youtube", None)
+		if youtube is None:
+			http = httplib2.Http(timeout=self.__timeout_seconds)
+			youtube = build("youtube", "v3", developerKey=self.__api_key, http=http)
+			self.__thread_local.youtube = youtube
+		return youtube
+
+	@staticmethod
+	def __is_quota_error(he: HttpError) -> bool:
+		if he.resp.status == 429:
+			return True
+		if he.resp.status != 403:
+			return False
+		error_details = he.error_details if isinstance(he.error_details, list) else []
+		return any(
+			isinstance(detail, dict)
+			and detail.get("reason") in YoutubeApiSearchBackend.__quota_error_reasons
+			for detail in error_details
+		)
+
+	def __get_video_durations(self, video_ids: list[str]) -> dict[str, str]:
+		"""
+		Fetches durations of all videos with a single request and converts them from ISO 8601 to h:m:s format.
+		Catches any errors, missing or unparsable durations are left out of the result.
+		"""
+		durations: dict[str, str] = {}
+		try:
+			video_details = (
+				self.__get_youtube()
+				.videos()
+				.list(id=",".join(video_ids), part="contentDetails")
+				.execute()
+			)
+		except Exception:
+			self.__logger.warning("Unknown error", exc_info=True)
+			return durations
+
+		for item in video_details.get("items", []):
+			try:
+				durations[item["id"]] = str(
+					isodate.parse_duration(item["contentDetails"]["duration"])
+				)
+			except Exception:
+				self.__logger.warning("Unknown error", exc_info=True)
+		return durations
+
+	def get_type(self) -> SearchBackendType:
+		return SearchBackendType.YOUTUBE_API
+
+	def is_available(self) -> bool:
+		return bool(self.__api_key)
+
+	def search(self, query: str, max_results: int) -> list[dict[str, str]]:
+		try:
+			search_results = (
+				self.__get_youtube()
+				.search()
+				.list(q=query, part="snippet", type="video", maxResults=max_results)
+				.execute()
+			)
+		except HttpError as he:
+			if YoutubeApiSearchBackend.__is_quota_error(he):
+				raise SearchQuotaError()
+			self.__logger.error("Unknown error", exc_info=True)
+			raise SearchError()
+
+		video_ids = [item["id"]["videoId"] for item in search_results["items"]]
+		durations = self.__get_video_durations(video_ids) if video_ids else {}
+
+		result = []
+		for item in search_results["items"]:
+			video_id = item["id"]["videoId"]
+			temp = {
+				"title": item["snippet"]["title"],
+				"url": self.__youtube_url_base + video_id,
+				"duration": durations.get(video_id, "??:??"),
+			}
+			result.append(temp)
+		return result
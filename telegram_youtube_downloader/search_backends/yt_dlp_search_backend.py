@@ -0,0 +1,65 @@
+import logging
+import datetime
+from typing import Any, cast
+
+import yt_dlp as yt
+from yt_dlp.utils import DownloadError as YtDlpDownloadError
+
+from telegram_youtube_downloader.errors.search_error import SearchError
+from telegram_youtube_downloader.statics.search_backend_type import SearchBackendType
+from telegram_youtube_downloader.search_backends.search_backend import SearchBackend
+
+
+class YtDlpSearchBackend(SearchBackend):
+	"""
+	Searches with yt_dlp 'ytsearchN:' flat extraction, does not need an api key or quota.
+	Title, url and duration come from the search page itself in a single request.
+	"""
+
+	def __init__(self, timeout_seconds: int) -> None:
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		self.__youtube_url_base = "https://www.youtube.com/watch?v="
+		self.__options = {
+			"quiet": True,
+			"no_warnings": True,
+			"skip_download": True,
+			"extract_flat": "in_playlist",
+			"socket_timeout": timeout_seconds,
+		}
+
+	@staticmethod
+	def __format_duration(duration: Any) -> str:
+		if not isinstance(duration, (int, float)):
+			return "??:??"
+		return str(datetime.timedelta(seconds=int(duration)))
+
+	def get_type(self) -> SearchBackendType:
+		return SearchBackendType.YT_DLP
+
+	def is_available(self) -> bool:
+		return True
+
+	def search(self, query: str, max_results: int) -> list[dict[str, str]]:
+		try:
+			# A new instance per search, YoutubeDL is not thread safe
+			with yt.YoutubeDL(cast(Any, self.__options)) as ydl:
+				search_results = ydl.extract_info(f"ytsearch{max_results}:{query}", download=False)
+		except YtDlpDownloadError as de:
+			self.__logger.warning(str(de))
+			raise SearchError()
+
+		if not isinstance(search_results, dict):
+			raise SearchError()
+
+		result = []
+		for entry in search_results.get("entries") or []:
+			video_id = entry.get("id")
+			if not video_id:
+				continue
+			temp = {
+				"title": entry.get("title") or video_id,
+				"url": self.__youtube_url_base + video_id,
+				"duration": YtDlpSearchBackend.__format_duration(entry.get("duration")),
+			}
+			result.append(temp)
+		return result
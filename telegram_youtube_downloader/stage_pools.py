@@ -0,0 +1,133 @@
+import os
+import asyncio
+import logging
+import threading
+import contextlib
+from typing import Any, TypeVar, Callable, AsyncIterator
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from telegram_youtube_downloader.stage_slot import StageSlot
+from telegram_youtube_downloader.utils.config_utils import ConfigUtils
+from telegram_youtube_downloader.statics.metric_name import MetricName
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
+
+
+T = TypeVar("T")
+
+
+class StagePools:
+	"""
+	Independent concurrency limits for the network bound download, cpu bound postprocess and upload stages.
+	Download and postprocess stages run on their own thread pools, uploads run on the event loop behind a semaphore.
+	Jobs enter the download stage by taking a download slot, so queued jobs wait in the scheduler instead of the pool.
+	Postprocess threads have a lower priority, ffmpeg processes started from them inherit it.
+	"""
+
+	def __init__(self) -> None:
+		self.__stage_options = ConfigUtils.get_app_config().download_queue_options.stage_options
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		postprocess_workers = self.__stage_options.postprocess_workers or os.cpu_count() or 1
+		self.__download_executor = ThreadPoolExecutor(
+			max_workers=self.__stage_options.download_workers, thread_name_prefix="DownloadWorker"
+		)
+		self.__postprocess_executor = ThreadPoolExecutor(
+			max_workers=postprocess_workers,
+			thread_name_prefix="PostprocessWorker",
+			initializer=self.__lower_thread_priority,
+		)
+		self.__download_semaphore = asyncio.Semaphore(self.__stage_options.download_workers)
+		self.__download_slots_in_use = 0
+		self.__upload_semaphore = asyncio.Semaphore(self.__stage_options.upload_workers)
+		# (stage, state) -> job count, changed from the pool threads and the event loop
+		self.__lock = threading.Lock()
+		self.__job_counts: dict[tuple[str, str], int] = {
+			(stage, state): 0
+			for stage in ("download", "postprocess", "upload")
+			for state in ("waiting", "running")
+		}
+		MetricsUtils.register_collector(
+			MetricName.STAGE_JOBS,
+			lambda: [
+				({"stage": stage, "state": state}, count)
+				for (stage, state), count in self.__job_counts.items()
+			],
+		)
+		self.__logger.info(
+			f"Stage pools, download {self.__stage_options.download_workers}, postprocess {postprocess_workers}, upload {self.__stage_options.upload_workers}"
+		)
+
+	def __lower_thread_priority(self) -> None:
+		"""Linux sets the priority per thread, child processes inherit the priority of the thread that started them"""
+		if not hasattr(os, "setpriority"):
+			return
+		try:
+			os.setpriority(
+				os.PRIO_PROCESS,
+				threading.get_native_id(),
+				self.__stage_options.postprocess_niceness,
+			)
+		except OSError:
+			self.__logger.warning("Cannot set postprocess thread priority", exc_info=True)
+
+	def __count(self, stage: str, state: str, change: int) -> None:
+		with self.__lock:
+			self.__job_counts[(stage, state)] += change
+
+	async def __run_in(self, stage: str, executor: Executor, fn: Callable[..., T], *args: Any) -> T:
+		def run() -> T:
+			self.__count(stage, "waiting", -1)
+			self.__count(stage, "running", 1)
+			try:
+				return fn(*args)
+			finally:
+				self.__count(stage, "running", -1)
+
+		self.__count(stage, "waiting", 1)
+		future = executor.submit(run)
+		try:
+			return await asyncio.wrap_future(future)
+		except asyncio.CancelledError:
+			# Not started yet, so it will not decrease the waiting count
+			if future.cancel():
+				self.__count(stage, "waiting", -1)
+			raise
+
+	def __release_download_slot(self, slot: StageSlot) -> None:
+		self.__download_slots_in_use -= 1
+		self.__download_semaphore.release()
+
+	async def acquire_download_slot(self) -> StageSlot:
+		"""Waits for a free download slot, the job releases it when its download ends"""
+		await self.__download_semaphore.acquire()
+		self.__download_slots_in_use += 1
+		return StageSlot("download", self.__release_download_slot)
+
+	def get_free_download_slots(self) -> int:
+		return self.__stage_options.download_workers - self.__download_slots_in_use
+
+	async def run_download(self, fn: Callable[..., T], *args: Any) -> T:
+		return await self.__run_in("download", self.__download_executor, fn, *args)
+
+	async def run_postprocess(self, fn: Callable[..., T], *args: Any) -> T:
+		return await self.__run_in("postprocess", self.__postprocess_executor, fn, *args)
+
+	@contextlib.asynccontextmanager
+	async def upload_slot(self) -> AsyncIterator[None]:
+		"""Waits for a free upload slot, must be used from the event loop"""
+		self.__count("upload", "waiting", 1)
+		try:
+			await self.__upload_semaphore.acquire()
+		finally:
+			self.__count("upload", "waiting", -1)
+
+		self.__count("upload", "running", 1)
+		try:
+			yield
+		finally:
+			self.__count("upload", "running", -1)
+			self.__upload_semaphore.release()
+
+	def shutdown(self) -> None:
+		"""Running downloads and postprocessing are not waited"""
+		self.__download_executor.shutdown(wait=False, cancel_futures=True)
+		self.__postprocess_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,17 @@
+from typing import Callable
+
+
+class StageSlot:
+	"""Concurrency slot of a stage held by a single job, released when the job leaves the stage"""
+
+	def __init__(self, stage: str, on_release: Callable[["StageSlot"], None]) -> None:
+		self.stage = stage
+		self.__on_release = on_release
+		self.__is_released = False
+
+	def release(self) -> None:
+		"""Frees the slot for the next job, safe to call more than once"""
+		if self.__is_released:
+			return
+		self.__is_released = True
+		self.__on_release(self)
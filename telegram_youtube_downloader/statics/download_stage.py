@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class DownloadStage(Enum):
+	DOWNLOADING = "DOWNLOADING"
+	PROCESSING = "PROCESSING"
@@ -0,0 +1,21 @@
+from enum import Enum
+
+
+class MetricName(Enum):
+	STAGE_DURATION_SECONDS = "tyd_stage_duration_seconds"
+	POSTPROCESS_PATH_DURATION_SECONDS = "tyd_postprocess_path_duration_seconds"
+	TELEGRAM_REQUEST_DURATION_SECONDS = "tyd_telegram_request_duration_seconds"
+	DOWNLOADED_BYTES_TOTAL = "tyd_downloaded_bytes_total"
+	UPLOADED_BYTES_TOTAL = "tyd_uploaded_bytes_total"
+	UPLOAD_ATTEMPTS_TOTAL = "tyd_upload_attempts_total"
+	ERRORS_TOTAL = "tyd_errors_total"
+	QUEUE_DEPTH = "tyd_queue_depth"
+	ACTIVE_JOBS = "tyd_active_jobs"
+	STAGE_JOBS = "tyd_stage_jobs"
+	CACHE_HITS_TOTAL = "tyd_cache_hits_total"
+	CACHE_MISSES_TOTAL = "tyd_cache_misses_total"
+	CACHE_HIT_RATIO = "tyd_cache_hit_ratio"
+	TEMP_STORAGE_RESERVED_BYTES = "tyd_temp_storage_reserved_bytes"
+	TEMP_STORAGE_USED_BYTES = "tyd_temp_storage_used_bytes"
+	TEMP_STORAGE_SWEPT_DIRS_TOTAL = "tyd_temp_storage_swept_dirs_total"
+	ADMISSION_REJECTIONS_TOTAL = "tyd_admission_rejections_total"
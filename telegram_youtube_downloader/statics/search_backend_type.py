@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class SearchBackendType(Enum):
+	YOUTUBE_API = "YOUTUBE_API"
+	YT_DLP = "YT_DLP"
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class SendPriority(Enum):
+	HIGH = "HIGH"  # Uploads of finished files
+	LOW = "LOW"  # Status messages
@@ -0,0 +1,25 @@
+import shutil
+import logging
+from typing import Callable
+
+
+class StorageReservation:
+	"""Temp directory of a single job with its reserved bytes, the directory is created by yt_dlp on first write"""
+
+	def __init__(
+		self, path: str, reserved_bytes: int, on_release: Callable[["StorageReservation"], None]
+	) -> None:
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		self.path = path
+		self.reserved_bytes = reserved_bytes
+		self.__on_release = on_release
+		self.__is_released = False
+
+	def release(self) -> None:
+		"""Deletes the directory and frees the reserved bytes, safe to call more than once"""
+		if self.__is_released:
+			return
+		self.__is_released = True
+		self.__logger.info(f"Deleting folder {self.path}")
+		shutil.rmtree(self.path, ignore_errors=True)
+		self.__on_release(self)
@@ -11,14 +11,19 @@ from telegram.ext import (
 	filters,
 )
 
-from telegram_youtube_downloader.download_thread import DownloadThread
+from telegram_youtube_downloader.download_job import DownloadJob
+from telegram_youtube_downloader.temp_storage import TempStorage
+from telegram_youtube_downloader.file_id_store import FileIdStore
+from telegram_youtube_downloader.metrics_server import MetricsServer
 from telegram_youtube_downloader.youtube_searcher import YoutubeSearcher
+from telegram_youtube_downloader.download_scheduler import DownloadScheduler
 from telegram_youtube_downloader.utils.config_utils import ConfigUtils
 from telegram_youtube_downloader.youtube_downloader import YoutubeDownloader
 from telegram_youtube_downloader.errors.search_error import SearchError
 from telegram_youtube_downloader.utils.api_key_utils import ApiKeyUtils
 from telegram_youtube_downloader.statics.content_type import ContentType
 from telegram_youtube_downloader.telegram_media_sender import TelegramMediaSender
+from telegram_youtube_downloader.telegram_metrics_request import TelegramMetricsRequest
 from telegram_youtube_downloader.statics.default_command_type import DefaultCommandType
 from telegram_youtube_downloader.decorators.telegram_bot_error_handler import (
 	TelegramBotErrorHandler,
@@ -37,9 +42,15 @@ class TelegramBot:
 		self.__base_url = self.__app_config.telegram_bot_options.base_url
 		self.__default_command = self.__app_config.telegram_bot_options.default_command
 
-		self.downloader = YoutubeDownloader()
-		self.media_sender = TelegramMediaSender()
+		self.temp_storage = TempStorage()
+		self.downloader = YoutubeDownloader(self.temp_storage)
 		self.youtube_searcher = YoutubeSearcher()
+		self.download_scheduler = DownloadScheduler()
+		self.file_id_store = FileIdStore()
+		self.metrics_server = MetricsServer()
+
+		# Created with the application's bot on start
+		self.media_sender: "TelegramMediaSender | None" = None
 
 	@staticmethod
 	def __video_title_formatter(title, duration, title_length=45) -> str:
@@ -50,6 +61,43 @@ class TelegramBot:
 			formatted_title += "..."
 		return formatted_title
 
+	@staticmethod
+	def __download_status_text(position: int, content_type: ContentType) -> str:
+		"""Returns the first status message of a download for its queue position"""
+		icon = "🎧" if content_type == ContentType.AUDIO else "📽️"
+		if position == 0:
+			return f"⬇️{icon} Download Starting..."
+		return f"🕒{icon} Download queued, position {position}"
+
+	def __submit_download(
+		self, url: str, chat_id: int, content_type: ContentType, dl_format_name: "str | None"
+	) -> tuple[int, DownloadJob]:
+		"""
+		Queues a download job, returns its queue position and the job that serves the chat.
+		Raises QueueFullError if the queue is full.
+		"""
+		if self.media_sender is None:
+			raise ValueError("Media sender is not initialized")
+
+		job = DownloadJob(
+			downloader=self.downloader,
+			media_sender=self.media_sender,
+			file_id_store=self.file_id_store,
+			url=url,
+			chat_id=chat_id,
+			content_type=content_type,
+			dl_format_name=dl_format_name,
+		)
+		return self.download_scheduler.submit(job)
+
+	async def download_scheduler_start(self, application: Application) -> None:
+		"""Application post_init hook, download workers need the running event loop"""
+		await self.download_scheduler.start()
+
+	async def download_scheduler_stop(self, application: Application) -> None:
+		"""Application post_shutdown hook"""
+		await self.download_scheduler.stop()
+
 	def start(self):
 		"""Starts pooling (blocking)"""
 
@@ -147,17 +195,11 @@ class TelegramBot:
 			else:
 				url, dl_format_name = args[0], None
 
-			await message.reply_text("⬇️🎧 Download Starting...")
-
-			dt = DownloadThread(
-				downloader=self.downloader,
-				media_sender=self.media_sender,
-				url=url,
-				chat_id=chat_id,
-				content_type=ContentType.AUDIO,
-				dl_format_name=dl_format_name,
+			position, job = self.__submit_download(url, chat_id, ContentType.AUDIO, dl_format_name)
+			status_message = await message.reply_text(
+				TelegramBot.__download_status_text(position, ContentType.AUDIO)
 			)
-			dt.start()
+			await job.attach_status_message(chat_id, status_message.message_id)
 
 		@TelegramBotErrorHandler.command_handler(
 			command_usage="/video <download url> or /video <format> <download url>\n/formats for available formats"
@@ -179,17 +221,11 @@ class TelegramBot:
 			else:
 				url, dl_format_name = args[0], None
 
-			await message.reply_text("⬇️📽️ Download Starting...")
-
-			dt = DownloadThread(
-				downloader=self.downloader,
-				media_sender=self.media_sender,
-				url=url,
-				chat_id=chat_id,
-				content_type=ContentType.VIDEO,
-				dl_format_name=dl_format_name,
+			position, job = self.__submit_download(url, chat_id, ContentType.VIDEO, dl_format_name)
+			status_message = await message.reply_text(
+				TelegramBot.__download_status_text(position, ContentType.VIDEO)
 			)
-			dt.start()
+			await job.attach_status_message(chat_id, status_message.message_id)
 
 		@TelegramBotErrorHandler.command_handler(command_usage="/search <query>")
 		@TelegramBotCommandInterceptor.secured_command(function_claims={"all", "search"})
@@ -214,7 +250,7 @@ class TelegramBot:
 
 			# Run search
 			try:
-				search_result = self.youtube_searcher.search(query=query)
+				search_result = await self.youtube_searcher.search_async(query=query)
 			except SearchError as se:
 				self.__logger.warning(str(se))
 				await message.reply_text(str(se))
@@ -296,34 +332,22 @@ class TelegramBot:
 			del user_data["urls"]
 
 			if data == "{{audio}}":
+				position, job = self.__submit_download(url, chat_id, ContentType.AUDIO, None)
+				status_text = TelegramBot.__download_status_text(position, ContentType.AUDIO)
 				await query.edit_message_text(
-					text=f"⬇️🎧 Download Starting...\n\nDownloading from\n{url}", reply_markup=None
-				)
-
-				dt = DownloadThread(
-					downloader=self.downloader,
-					media_sender=self.media_sender,
-					url=url,
-					chat_id=chat_id,
-					content_type=ContentType.AUDIO,
-					dl_format_name=None,
+					text=f"{status_text}\n\nDownloading from\n{url}", reply_markup=None
 				)
-				dt.start()
+				if query.message is not None:
+					await job.attach_status_message(chat_id, query.message.message_id)
 
 			if data == "{{video}}":
+				position, job = self.__submit_download(url, chat_id, ContentType.VIDEO, None)
+				status_text = TelegramBot.__download_status_text(position, ContentType.VIDEO)
 				await query.edit_message_text(
-					text=f"⬇️📽️ Download Starting...\n\nDownloading from\n{url}", reply_markup=None
-				)
-
-				dt = DownloadThread(
-					downloader=self.downloader,
-					media_sender=self.media_sender,
-					url=url,
-					chat_id=chat_id,
-					content_type=ContentType.VIDEO,
-					dl_format_name=None,
+					text=f"{status_text}\n\nDownloading from\n{url}", reply_markup=None
 				)
-				dt.start()
+				if query.message is not None:
+					await job.attach_status_message(chat_id, query.message.message_id)
 
 		async def default_message_handler(
 			update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -348,7 +372,19 @@ class TelegramBot:
 		if self.__bot_key is None:
 			raise ValueError("Telegram bot key is not set")
 
-		application_builder = Application.builder().token(self.__bot_key)
+		telegram_options = self.__app_config.telegram_bot_options
+		application_builder = (
+			Application.builder()
+			.token(self.__bot_key)
+			.request(
+				TelegramMetricsRequest(
+					connection_pool_size=telegram_options.connection_pool_size,
+					connect_timeout=telegram_options.connect_timeout_seconds,
+				)
+			)
+			.post_init(self.download_scheduler_start)
+			.post_shutdown(self.download_scheduler_stop)
+		)
 
 		if self.__base_url is not None:
 			self.__logger.info(f"Using custom api url ({self.__base_url})")
@@ -356,6 +392,9 @@ class TelegramBot:
 
 		application = application_builder.build()
 
+		# Media sender shares the application's bot and its http connection pool
+		self.media_sender = TelegramMediaSender(application.bot)
+
 		self.__logger.info("Bot created, starting pooling")
 
 		# Command handler
@@ -398,5 +437,12 @@ class TelegramBot:
 		# Error handler
 		application.add_error_handler(error)
 
+		# Metrics are served and temp storage is swept on their own threads
+		self.metrics_server.start()
+		self.temp_storage.start()
+
 		# Start pooling
 		application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+		self.temp_storage.stop()
+		self.metrics_server.stop()
@@ -1,108 +1,412 @@
-import os
-import shutil
+import re
+import time
+import random
+import asyncio
 import logging
+import datetime
+import contextlib
+from typing import Any, Callable, Awaitable
+from collections import deque
 
-import requests
+from telegram import Bot, Message, InputFile, InputMediaAudio, InputMediaVideo
+from telegram.error import TimedOut, BadRequest, RetryAfter, NetworkError, TelegramError
+from telegram.constants import ParseMode
 
+from telegram_youtube_downloader.data.media_part import MediaPart
 from telegram_youtube_downloader.errors.send_error import SendError
 from telegram_youtube_downloader.utils.config_utils import ConfigUtils
-from telegram_youtube_downloader.utils.api_key_utils import ApiKeyUtils
+from telegram_youtube_downloader.statics.metric_name import MetricName
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
+from telegram_youtube_downloader.statics.content_type import ContentType
+from telegram_youtube_downloader.data.request_timeouts import RequestTimeouts
+from telegram_youtube_downloader.statics.send_priority import SendPriority
+from telegram_youtube_downloader.telegram_rate_limiter import TelegramRateLimiter
+from telegram_youtube_downloader.errors.stale_file_id_error import StaleFileIdError
 
 
 class TelegramMediaSender:
-	"""Custom media sender class for telegrams native api"""
+	"""
+	Media sender that uses the Application's bot, so all requests share its async http client.
+	All requests go through the shared rate limiter, 429 responses are retried after retry_after.
+	"""
 
-	__default_telegram_api_url = "https://api.telegram.org/bot"
-
-	def __init__(self) -> None:
+	def __init__(self, bot: Bot) -> None:
 		self.__telegram_options = ConfigUtils.get_app_config().telegram_bot_options
-		self.__bot_key = ApiKeyUtils.get_telegram_bot_key()
+		self.__bot = bot
 		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
-		__base_url_config = ConfigUtils.get_app_config().telegram_bot_options.base_url
-		self.__base_url = (
-			__base_url_config if __base_url_config is not None else self.__default_telegram_api_url
+		self.__rate_limiter = TelegramRateLimiter()
+		# Progress edit throttling, chat id -> last edit time and edit times of all chats in the last second
+		self.__last_chat_edits: dict[int, float] = {}
+		self.__recent_edits: deque[float] = deque()
+
+	def __get_timeouts(self, timeout: int) -> RequestTimeouts:
+		"""Connect timeout is shared, read and write timeouts are set per endpoint"""
+		return {
+			"read_timeout": timeout,
+			"write_timeout": timeout,
+			"connect_timeout": self.__telegram_options.connect_timeout_seconds,
+		}
+
+	@staticmethod
+	def __get_retry_after_seconds(ra: RetryAfter) -> float:
+		"""retry_after is int or timedelta depending on the python-telegram-bot settings"""
+		retry_after: Any = ra.retry_after
+		if isinstance(retry_after, datetime.timedelta):
+			return retry_after.total_seconds()
+		return float(retry_after)
+
+	async def __request(
+		self, chat_id: int, priority: SendPriority, request: Callable[[], Awaitable[Any]]
+	) -> Any:
+		"""Runs the request when the rate limiter allows, retries after 429 responses"""
+		rate_limit_options = self.__telegram_options.rate_limit_options
+		retry_count = 0
+		while True:
+			await self.__rate_limiter.acquire(chat_id, priority)
+			try:
+				return await request()
+			except RetryAfter as ra:
+				retry_after = TelegramMediaSender.__get_retry_after_seconds(ra)
+				self.__rate_limiter.pause(chat_id, retry_after)
+				if (
+					retry_count >= rate_limit_options.max_retries
+					or retry_after > rate_limit_options.max_retry_after_seconds
+				):
+					raise
+				retry_count += 1
+				self.__logger.warning(
+					f"Rate limited on chat {chat_id}, retrying after {retry_after} seconds ({retry_count}/{rate_limit_options.max_retries})"
+				)
+
+	@staticmethod
+	def __is_transient_error(ne: NetworkError) -> bool:
+		"""
+		Timeouts, connection errors and 5xx responses are transient.
+		BadRequest and other responses with an error status are permanent, the same upload fails again.
+		"""
+		if isinstance(ne, TimedOut):
+			return True
+		if isinstance(ne, BadRequest):
+			return False
+		# Connection errors of the http client are chained, errors built from a response are not
+		if ne.__cause__ is not None and not isinstance(ne.__cause__, TelegramError):
+			return True
+		return re.search(r"\(5\d\d\)$", ne.message) is not None
+
+	@staticmethod
+	def __is_file_id_error(br: BadRequest) -> bool:
+		"""Only errors about the file id mean the cached id is stale, others are about the chat or the request"""
+		return (
+			re.search(
+				r"file identifier|file reference|file_id|remote file", br.message, re.IGNORECASE
+			)
+			is not None
 		)
 
-	def send_text(self, chat_id: int, text: str) -> None:
+	async def __upload(self, chat_id: int, upload: Callable[[], Awaitable[Any]]) -> Any:
+		"""
+		Uploads with exponential backoff and jitter on timeouts and connection errors.
+		The file stays on disk until the upload succeeds or the attempts are exhausted.
+		"""
+		retry_options = self.__telegram_options.upload_retry_options
+		attempt = 1
+		while True:
+			try:
+				message = await self.__request(chat_id, SendPriority.HIGH, upload)
+				MetricsUtils.inc(MetricName.UPLOAD_ATTEMPTS_TOTAL, labels={"result": "ok"})
+				if attempt > 1:
+					self.__logger.info(f"Upload to chat {chat_id} succeeded on attempt {attempt}")
+				return message
+
+			except NetworkError as ne:
+				if not TelegramMediaSender.__is_transient_error(ne):
+					MetricsUtils.inc(MetricName.UPLOAD_ATTEMPTS_TOTAL, labels={"result": "failed"})
+					raise
+				if attempt >= retry_options.max_attempts:
+					MetricsUtils.inc(MetricName.UPLOAD_ATTEMPTS_TOTAL, labels={"result": "failed"})
+					self.__logger.warning(
+						f"Upload attempt {attempt}/{retry_options.max_attempts} to chat {chat_id} failed ({ne.message}), giving up"
+					)
+					raise
+
+				# Half of the backoff is fixed, the other half is random so retries of different jobs spread out
+				backoff = min(
+					retry_options.max_backoff_seconds,
+					retry_options.initial_backoff_seconds * 2 ** (attempt - 1),
+				)
+				delay = backoff / 2 + random.uniform(0, backoff / 2)
+				MetricsUtils.inc(MetricName.UPLOAD_ATTEMPTS_TOTAL, labels={"result": "retry"})
+				self.__logger.warning(
+					f"Upload attempt {attempt}/{retry_options.max_attempts} to chat {chat_id} failed ({ne.message}), retrying in {delay:.1f} seconds"
+				)
+				await asyncio.sleep(delay)
+				attempt += 1
+
+	@staticmethod
+	def __get_file_id(message: Message) -> "str | None":
+		"""Telegram may store a video as a document or animation, so the effective attachment is used"""
+		return getattr(message.effective_attachment, "file_id", None)
+
+	def __is_progress_edit_allowed(self, chat_id: int) -> bool:
+		"""Progress edits are throttled per chat and globally to stay inside Telegram rate limits"""
+		progress_options = self.__telegram_options.progress_options
+		now = time.monotonic()
+		while self.__recent_edits and now - self.__recent_edits[0] >= 1:
+			self.__recent_edits.popleft()
+		if len(self.__recent_edits) >= progress_options.max_edits_per_second:
+			return False
+		if (
+			now - self.__last_chat_edits.get(chat_id, 0.0)
+			< progress_options.chat_edit_interval_seconds
+		):
+			return False
+
+		self.__recent_edits.append(now)
+		self.__last_chat_edits[chat_id] = now
+		if len(self.__last_chat_edits) > 1000:
+			self.__last_chat_edits = {
+				key: value
+				for key, value in self.__last_chat_edits.items()
+				if now - value < progress_options.chat_edit_interval_seconds
+			}
+		return True
+
+	async def edit_text(
+		self, chat_id: int, message_id: int, text: str, is_progress: bool = False
+	) -> bool:
+		"""
+		Edits a status message, returns False if the edit was not made.
+		Progress edits are dropped when throttled, errors are logged and not raised.
+		"""
+
+		def edit():
+			return self.__bot.edit_message_text(
+				chat_id=chat_id,
+				message_id=message_id,
+				text=text,
+				parse_mode=ParseMode.HTML,
+				**self.__get_timeouts(self.__telegram_options.text_timeout_seconds),
+			)
+
 		try:
-			payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+			if not is_progress:
+				await self.__request(chat_id, SendPriority.LOW, edit)
+				return True
 
-			url = f"{self.__base_url}{self.__bot_key}/sendMessage"
-			timeout = self.__telegram_options.text_timeout_seconds
+			# Progress edits are skipped instead of waiting or retrying
+			if not self.__is_progress_edit_allowed(chat_id):
+				return False
+			if not self.__rate_limiter.try_acquire(chat_id, SendPriority.LOW):
+				return False
+			await edit()
+			return True
 
-			resp = requests.post(url, data=payload, timeout=timeout).json()
-			self.__logger.info(resp)
+		except RetryAfter as ra:
+			self.__rate_limiter.pause(chat_id, TelegramMediaSender.__get_retry_after_seconds(ra))
+			self.__logger.warning(f"Could not edit message, Telegram: {ra.message}")
+			return False
 
-			if not resp["ok"]:
-				self.__logger.warning(resp)
-				raise SendError(f"Could not send message, Telegram: {resp['description']}")
+		except BadRequest as br:
+			# Same text as before, nothing to update
+			if "not modified" in br.message:
+				return True
+			self.__logger.warning(f"Could not edit message, Telegram: {br.message}")
+			return False
 
-		except Exception:
-			self.__logger.error("Unknown error", exc_info=True)
-			raise SendError()
+		except TelegramError as te:
+			self.__logger.warning(f"Could not edit message, Telegram: {te.message}")
+			return False
 
-	def send_audio(self, chat_id: int, file_path: str, file_name: str, remove=False) -> None:
+	async def send_audio(self, chat_id: int, file_path: str, file_name: str) -> "str | None":
+		"""Uploads an audio file, returns its telegram file id"""
 		try:
-			with open(file_path, "rb") as audio:
-				payload = {"chat_id": chat_id, "title": file_name, "parse_mode": "HTML"}
-				files = {
-					"audio": (file_name, audio.read()),
-				}
-				url = f"{self.__base_url}{self.__bot_key}/sendAudio"
-				timeout = self.__telegram_options.audio_timeout_seconds
-
-				resp = requests.post(url, data=payload, files=files, timeout=timeout).json()
-				self.__logger.info(resp)
-
-				if not resp["ok"]:
-					self.__logger.warning(resp)
-					raise SendError(f"Could not send audio, Telegram: {resp['description']}")
-
-		except requests.Timeout, requests.ConnectionError:
-			self.__logger.warning("Could not send audio, timeout")
+
+			async def upload() -> Message:
+				# File handle is streamed from disk by the http client instead of being read into memory
+				with open(file_path, "rb") as audio:
+					return await self.__bot.send_audio(
+						chat_id=chat_id,
+						audio=InputFile(audio, filename=file_name, read_file_handle=False),
+						title=file_name,
+						parse_mode=ParseMode.HTML,
+						**self.__get_timeouts(self.__telegram_options.audio_timeout_seconds),
+					)
+
+			# File is opened again on each attempt
+			message = await self.__upload(chat_id, upload)
+			self.__logger.info(f"Audio sent to chat {chat_id}, {message.audio}")
+			return TelegramMediaSender.__get_file_id(message)
+
+		except TimedOut:
+			self.__logger.warning("Could not send audio, timeout", exc_info=True)
 			raise SendError("Could not send audio, timeout")
 
+		except TelegramError as te:
+			self.__logger.warning(f"Could not send audio, Telegram: {te.message}")
+			raise SendError(f"Could not send audio, Telegram: {te.message}")
+
 		except Exception:
 			self.__logger.error("Unknown error", exc_info=True)
 			raise SendError("Could not sent audio")
 
-		finally:
-			if remove:
-				self.__logger.info(f"Deleting folder {file_path}")
+	async def send_video(self, chat_id: int, file_path: str, file_name: str) -> "str | None":
+		"""Uploads a video file, returns its telegram file id"""
+		try:
 
-				# Try to delete folder
-				folder_name, _ = os.path.split(file_path)
-				shutil.rmtree(folder_name, ignore_errors=True)
+			async def upload() -> Message:
+				# File handle is streamed from disk by the http client instead of being read into memory
+				with open(file_path, "rb") as video:
+					return await self.__bot.send_video(
+						chat_id=chat_id,
+						video=InputFile(video, filename=file_name, read_file_handle=False),
+						parse_mode=ParseMode.HTML,
+						**self.__get_timeouts(self.__telegram_options.video_timeout_seconds),
+					)
 
-	def send_video(self, chat_id: int, file_path: str, file_name: str, remove=False) -> None:
-		try:
-			with open(file_path, "rb") as video:
-				payload = {"chat_id": chat_id, "title": file_name, "parse_mode": "HTML"}
-				files = {
-					"video": (file_name, video.read()),
-				}
-				url = f"{self.__base_url}{self.__bot_key}/sendVideo"
-				timeout = self.__telegram_options.video_timeout_seconds
-
-				resp = requests.post(url, data=payload, files=files, timeout=timeout).json()
-				self.__logger.info(resp)
-
-				if not resp["ok"]:
-					self.__logger.warning(resp)
-					raise SendError(f"Could not send video, Telegram: {resp['description']}")
-
-		except requests.Timeout, requests.ConnectionError:
-			self.__logger.warning("Could not send video, timeout")
+			# File is opened again on each attempt
+			message = await self.__upload(chat_id, upload)
+			self.__logger.info(f"Video sent to chat {chat_id}, {message.video}")
+			return TelegramMediaSender.__get_file_id(message)
+
+		except TimedOut:
+			self.__logger.warning("Could not send video, timeout", exc_info=True)
 			raise SendError("Could not send video, timeout")
 
+		except TelegramError as te:
+			self.__logger.warning(f"Could not send video, Telegram: {te.message}")
+			raise SendError(f"Could not send video, Telegram: {te.message}")
+
 		except Exception:
 			self.__logger.error("Unknown error", exc_info=True)
 			raise SendError("Could not sent video")
 
-		finally:
-			if remove:
-				self.__logger.info(f"Deleting folder {file_path}")
+	async def send_audio_by_file_id(self, chat_id: int, file_id: str) -> None:
+		"""Resends an already uploaded audio, raises StaleFileIdError if telegram rejects the file id, else SendError"""
+		try:
+			await self.__request(
+				chat_id,
+				SendPriority.HIGH,
+				lambda: self.__bot.send_audio(
+					chat_id=chat_id,
+					audio=file_id,
+					**self.__get_timeouts(self.__telegram_options.text_timeout_seconds),
+				),
+			)
+			self.__logger.info(f"Audio {file_id} resent to chat {chat_id}")
+
+		except BadRequest as br:
+			if not TelegramMediaSender.__is_file_id_error(br):
+				self.__logger.warning(f"Could not resend audio {file_id}, Telegram: {br.message}")
+				raise SendError(f"Could not resend audio, Telegram: {br.message}")
+			self.__logger.warning(f"Telegram rejected audio {file_id}: {br.message}")
+			raise StaleFileIdError(f"Could not resend audio, Telegram: {br.message}")
+
+		except TelegramError as te:
+			self.__logger.warning(f"Could not resend audio {file_id}, Telegram: {te.message}")
+			raise SendError(f"Could not resend audio, Telegram: {te.message}")
+
+	async def send_video_by_file_id(self, chat_id: int, file_id: str) -> None:
+		"""Resends an already uploaded video, raises StaleFileIdError if telegram rejects the file id, else SendError"""
+		try:
+			await self.__request(
+				chat_id,
+				SendPriority.HIGH,
+				lambda: self.__bot.send_video(
+					chat_id=chat_id,
+					video=file_id,
+					**self.__get_timeouts(self.__telegram_options.text_timeout_seconds),
+				),
+			)
+			self.__logger.info(f"Video {file_id} resent to chat {chat_id}")
+
+		except BadRequest as br:
+			if not TelegramMediaSender.__is_file_id_error(br):
+				self.__logger.warning(f"Could not resend video {file_id}, Telegram: {br.message}")
+				raise SendError(f"Could not resend video, Telegram: {br.message}")
+			self.__logger.warning(f"Telegram rejected video {file_id}: {br.message}")
+			raise StaleFileIdError(f"Could not resend video, Telegram: {br.message}")
+
+		except TelegramError as te:
+			self.__logger.warning(f"Could not resend video {file_id}, Telegram: {te.message}")
+			raise SendError(f"Could not resend video, Telegram: {te.message}")
+
+	def __get_media_timeout(self, content_type: ContentType) -> int:
+		if content_type == ContentType.AUDIO:
+			return self.__telegram_options.audio_timeout_seconds
+		return self.__telegram_options.video_timeout_seconds
+
+	@staticmethod
+	def __build_input_media(
+		content_type: ContentType, media: "str | InputFile", title: str
+	) -> "InputMediaAudio | InputMediaVideo":
+		if content_type == ContentType.AUDIO:
+			return InputMediaAudio(media=media, title=title)
+		return InputMediaVideo(media=media, caption=title)
+
+	async def send_media_group(
+		self, chat_id: int, content_type: ContentType, parts: list[MediaPart]
+	) -> "list[str | None]":
+		"""Uploads 2-10 parts as one album, returns their telegram file ids in order"""
+		try:
+
+			async def upload() -> tuple[Message, ...]:
+				# File handles are streamed from disk by the http client instead of being read into memory
+				with contextlib.ExitStack() as stack:
+					media = [
+						TelegramMediaSender.__build_input_media(
+							content_type,
+							InputFile(
+								stack.enter_context(open(part.file_path, "rb")),
+								filename=part.file_name,
+								attach=True,
+								read_file_handle=False,
+							),
+							part.file_name,
+						)
+						for part in parts
+					]
+					return await self.__bot.send_media_group(
+						chat_id=chat_id,
+						media=media,
+						**self.__get_timeouts(self.__get_media_timeout(content_type)),
+					)
+
+			# Files are opened again on each attempt
+			messages = await self.__upload(chat_id, upload)
+			self.__logger.info(f"Media group of {len(parts)} parts sent to chat {chat_id}")
+			return [TelegramMediaSender.__get_file_id(message) for message in messages]
+
+		except TimedOut:
+			self.__logger.warning("Could not send media group, timeout", exc_info=True)
+			raise SendError("Could not send parts, timeout")
+
+		except TelegramError as te:
+			self.__logger.warning(f"Could not send media group, Telegram: {te.message}")
+			raise SendError(f"Could not send parts, Telegram: {te.message}")
+
+		except Exception:
+			self.__logger.error("Unknown error", exc_info=True)
+			raise SendError("Could not send parts")
+
+	async def send_media_group_by_file_ids(
+		self, chat_id: int, content_type: ContentType, file_ids: list[str], titles: list[str]
+	) -> None:
+		"""Resends 2-10 already uploaded parts as one album, raises SendError if telegram rejects a file id"""
+		try:
+			await self.__request(
+				chat_id,
+				SendPriority.HIGH,
+				lambda: self.__bot.send_media_group(
+					chat_id=chat_id,
+					media=[
+						TelegramMediaSender.__build_input_media(content_type, file_id, title)
+						for file_id, title in zip(file_ids, titles)
+					],
+					**self.__get_timeouts(self.__telegram_options.text_timeout_seconds),
+				),
+			)
+			self.__logger.info(f"Media group of {len(file_ids)} parts resent to chat {chat_id}")
 
-				# Try to delete folder
-				folder_name, _ = os.path.split(file_path)
-				shutil.rmtree(folder_name, ignore_errors=True)
+		except TelegramError as te:
+			self.__logger.warning(f"Could not resend media group, Telegram: {te.message}")
+			raise SendError(f"Could not resend parts, Telegram: {te.message}")
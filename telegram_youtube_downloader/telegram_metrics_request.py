@@ -0,0 +1,25 @@
+import time
+from typing import Any
+
+from telegram.request import HTTPXRequest
+
+from telegram_youtube_downloader.statics.metric_name import MetricName
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
+
+
+class TelegramMetricsRequest(HTTPXRequest):
+	"""HTTPXRequest that records the duration of every Telegram api request by method"""
+
+	async def do_request(
+		self, url: str, method: str, *args: Any, **kwargs: Any
+	) -> tuple[int, bytes]:
+		request_start = time.time()
+		try:
+			return await super().do_request(url, method, *args, **kwargs)
+		finally:
+			# Ex: https://api.telegram.org/bot<token>/sendAudio  ->  sendAudio
+			MetricsUtils.observe(
+				MetricName.TELEGRAM_REQUEST_DURATION_SECONDS,
+				time.time() - request_start,
+				{"method": url.rsplit("/", 1)[-1]},
+			)
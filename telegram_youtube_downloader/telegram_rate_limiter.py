@@ -0,0 +1,95 @@
+import asyncio
+import logging
+
+from telegram_youtube_downloader.utils.config_utils import ConfigUtils
+from telegram_youtube_downloader.utils.token_bucket import TokenBucket
+from telegram_youtube_downloader.statics.send_priority import SendPriority
+
+
+class TelegramRateLimiter:
+	"""
+	Shared limiter for Telegram requests, with a global token bucket and one bucket per chat.
+	High priority requests are served first, a low priority request waits while a high priority request
+	waits for the same chat or only for the global bucket. High priority requests of paused chats do not hold other chats.
+	"""
+
+	def __init__(self) -> None:
+		self.__rate_limit_options = (
+			ConfigUtils.get_app_config().telegram_bot_options.rate_limit_options
+		)
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		self.__global_bucket = TokenBucket(
+			self.__rate_limit_options.global_rate_per_second,
+			self.__rate_limit_options.global_rate_per_second,
+		)
+		self.__chat_buckets: dict[int, TokenBucket] = {}
+		# Chat id -> high priority requests waiting for the chat
+		self.__high_priority_waiting: dict[int, int] = {}
+
+	def __get_chat_bucket(self, chat_id: int) -> TokenBucket:
+		chat_bucket = self.__chat_buckets.get(chat_id)
+		if chat_bucket is None:
+			if len(self.__chat_buckets) > 1000:
+				self.__chat_buckets = {
+					key: bucket
+					for key, bucket in self.__chat_buckets.items()
+					if not bucket.is_idle()
+				}
+			chat_bucket = TokenBucket(
+				self.__rate_limit_options.chat_rate_per_second, self.__rate_limit_options.chat_burst
+			)
+			self.__chat_buckets[chat_id] = chat_bucket
+		return chat_bucket
+
+	def __is_high_priority_ahead(self, chat_id: int) -> bool:
+		"""A high priority request waits for the same chat, or its chat has a token and it waits for the global bucket"""
+		if chat_id in self.__high_priority_waiting:
+			return True
+		return any(
+			self.__get_chat_bucket(waiting_chat_id).get_wait_seconds() <= 0
+			for waiting_chat_id in self.__high_priority_waiting
+		)
+
+	def __take(self, chat_id: int, priority: SendPriority) -> float:
+		"""Takes tokens from both buckets and returns 0, or returns seconds to wait before trying again"""
+		if priority == SendPriority.LOW and self.__is_high_priority_ahead(chat_id):
+			return 0.05
+
+		chat_bucket = self.__get_chat_bucket(chat_id)
+		wait_seconds = max(chat_bucket.get_wait_seconds(), self.__global_bucket.get_wait_seconds())
+		if wait_seconds > 0:
+			return wait_seconds
+
+		chat_bucket.take()
+		self.__global_bucket.take()
+		return 0.0
+
+	async def acquire(self, chat_id: int, priority: SendPriority) -> None:
+		"""Waits until a request can be made to the chat"""
+		if not self.__rate_limit_options.enabled:
+			return
+
+		if priority == SendPriority.HIGH:
+			self.__high_priority_waiting[chat_id] = self.__high_priority_waiting.get(chat_id, 0) + 1
+		try:
+			while True:
+				wait_seconds = self.__take(chat_id, priority)
+				if wait_seconds <= 0:
+					return
+				await asyncio.sleep(wait_seconds)
+		finally:
+			if priority == SendPriority.HIGH:
+				self.__high_priority_waiting[chat_id] -= 1
+				if self.__high_priority_waiting[chat_id] == 0:
+					del self.__high_priority_waiting[chat_id]
+
+	def try_acquire(self, chat_id: int, priority: SendPriority) -> bool:
+		"""Returns False instead of waiting, for requests that can be skipped"""
+		if not self.__rate_limit_options.enabled:
+			return True
+		return self.__take(chat_id, priority) <= 0
+
+	def pause(self, chat_id: int, seconds: float) -> None:
+		"""Stops requests to the chat, Ex: after a 429 response with retry_after"""
+		self.__logger.warning(f"Requests to chat {chat_id} are paused for {seconds} seconds")
+		self.__get_chat_bucket(chat_id).pause(seconds)
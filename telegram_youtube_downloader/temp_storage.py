@@ -0,0 +1,186 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+
+from telegram_youtube_downloader.utils.config_utils import ConfigUtils
+from telegram_youtube_downloader.statics.metric_name import MetricName
+from telegram_youtube_downloader.storage_reservation import StorageReservation
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
+from telegram_youtube_downloader.statics.content_type import ContentType
+from telegram_youtube_downloader.errors.download_error import DownloadError
+
+
+class TempStorage:
+	"""
+	Manages job directories under the configured temp roots with a global byte quota.
+	Directories that do not belong to a running job are swept on startup and periodically.
+	Only directories named like job directories (uuid) are ever swept.
+	"""
+
+	def __init__(self) -> None:
+		self.__storage_options = ConfigUtils.get_app_config().temp_storage_options
+		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		# Released reservations notify jobs waiting for space
+		self.__lock = threading.Condition()
+		self.__reservations: dict[str, StorageReservation] = {}
+		self.__reserved_bytes = 0
+		self.__swept_count = 0
+		self.__stop_event = threading.Event()
+		self.__sweeper: "threading.Thread | None" = None
+
+		MetricsUtils.register_collector(
+			MetricName.TEMP_STORAGE_RESERVED_BYTES, lambda: [({}, self.get_reserved_bytes())]
+		)
+		MetricsUtils.register_collector(
+			MetricName.TEMP_STORAGE_USED_BYTES,
+			lambda: [
+				({"root": root}, TempStorage.__get_used_bytes(root)) for root in self.__get_roots()
+			],
+		)
+		MetricsUtils.register_collector(
+			MetricName.TEMP_STORAGE_SWEPT_DIRS_TOTAL, lambda: [({}, self.__swept_count)]
+		)
+
+	def __get_root(self, content_type: ContentType) -> str:
+		if content_type == ContentType.AUDIO:
+			return self.__storage_options.audio_root
+		return self.__storage_options.video_root
+
+	def __get_roots(self) -> list[str]:
+		return sorted({self.__storage_options.audio_root, self.__storage_options.video_root})
+
+	def __get_reservation_bytes(self, content_type: ContentType) -> int:
+		if content_type == ContentType.AUDIO:
+			return self.__storage_options.audio_reservation_bytes
+		return self.__storage_options.video_reservation_bytes
+
+	@staticmethod
+	def __is_job_dir_name(name: str) -> bool:
+		try:
+			uuid.UUID(name)
+			return True
+		except ValueError:
+			return False
+
+	@staticmethod
+	def __get_used_bytes(root: str) -> int:
+		used_bytes = 0
+		for dir_path, _, file_names in os.walk(root):
+			for file_name in file_names:
+				try:
+					used_bytes += os.path.getsize(os.path.join(dir_path, file_name))
+				except OSError:
+					pass
+		return used_bytes
+
+	def __release(self, reservation: StorageReservation) -> None:
+		with self.__lock:
+			if self.__reservations.pop(reservation.path, None) is not None:
+				self.__reserved_bytes -= reservation.reserved_bytes
+				self.__lock.notify_all()
+
+	@staticmethod
+	def __get_free_disk_bytes(root: str) -> "int | None":
+		try:
+			return shutil.disk_usage(root).free
+		except OSError:
+			return None
+
+	def reserve(self, content_type: ContentType) -> StorageReservation:
+		"""Reserves bytes for a job directory, raises DownloadError if the quota is full"""
+		reserved_bytes = self.__get_reservation_bytes(content_type)
+		quota_bytes = self.__storage_options.quota_bytes
+		path = os.path.join(self.__get_root(content_type), str(uuid.uuid4()))
+
+		with self.__lock:
+			if quota_bytes > 0 and self.__reserved_bytes + reserved_bytes > quota_bytes:
+				self.__logger.warning(
+					f"Temp storage quota is full, {self.__reserved_bytes} of {quota_bytes} bytes reserved"
+				)
+				raise DownloadError("Temporary storage is full, please try again later")
+			reservation = StorageReservation(path, reserved_bytes, self.__release)
+			self.__reservations[path] = reservation
+			self.__reserved_bytes += reserved_bytes
+		return reservation
+
+	def resize(
+		self,
+		reservation: StorageReservation,
+		content_type: ContentType,
+		reserved_bytes: int,
+		wait_seconds: float,
+	) -> None:
+		"""
+		Changes the reserved bytes of a job, waits up to wait_seconds for other jobs to free space.
+		Raises DownloadError if the quota or the free disk space of the root is not enough.
+		"""
+		quota_bytes = self.__storage_options.quota_bytes
+		free_disk_bytes = TempStorage.__get_free_disk_bytes(self.__get_root(content_type))
+		if free_disk_bytes is not None and free_disk_bytes < reserved_bytes:
+			self.__logger.warning(
+				f"Not enough free disk for {reserved_bytes} bytes, {free_disk_bytes} bytes free"
+			)
+			raise DownloadError("Temporary storage is full, please try again later")
+
+		def has_space() -> bool:
+			reserved_by_others = self.__reserved_bytes - reservation.reserved_bytes
+			return quota_bytes <= 0 or reserved_by_others + reserved_bytes <= quota_bytes
+
+		with self.__lock:
+			if reservation.path not in self.__reservations:
+				return
+			if not self.__lock.wait_for(has_space, timeout=wait_seconds):
+				self.__logger.warning(
+					f"Temp storage quota is full, could not reserve {reserved_bytes} bytes in {wait_seconds} seconds"
+				)
+				raise DownloadError("Temporary storage is full, please try again later")
+			self.__reserved_bytes += reserved_bytes - reservation.reserved_bytes
+			reservation.reserved_bytes = reserved_bytes
+			self.__lock.notify_all()
+
+	def sweep(self, min_age_seconds: float = 0) -> None:
+		"""Deletes job directories that do not belong to a reservation and are older than min_age_seconds"""
+		now = time.time()
+		for root in self.__get_roots():
+			if not os.path.isdir(root):
+				continue
+			for name in os.listdir(root):
+				path = os.path.join(root, name)
+				if not TempStorage.__is_job_dir_name(name) or not os.path.isdir(path):
+					continue
+				with self.__lock:
+					if path in self.__reservations:
+						continue
+				try:
+					if now - os.path.getmtime(path) < min_age_seconds:
+						continue
+				except OSError:
+					continue
+				self.__logger.info(f"Deleting orphan folder {path}")
+				shutil.rmtree(path, ignore_errors=True)
+				self.__swept_count += 1
+
+	def __sweep_periodically(self) -> None:
+		interval = self.__storage_options.sweep_interval_seconds
+		while not self.__stop_event.wait(interval):
+			try:
+				self.sweep(self.__storage_options.orphan_min_age_seconds)
+			except Exception:
+				self.__logger.error("Unknown error", exc_info=True)
+
+	def start(self) -> None:
+		"""Sweeps all leftover job directories and starts the periodic sweep"""
+		self.sweep()
+		self.__sweeper = threading.Thread(
+			target=self.__sweep_periodically, name="TempStorageSweeper", daemon=True
+		)
+		self.__sweeper.start()
+
+	def stop(self) -> None:
+		self.__stop_event.set()
+
+	def get_reserved_bytes(self) -> int:
+		return self.__reserved_bytes
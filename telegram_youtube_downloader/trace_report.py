@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import math
+import argparse
+
+from telegram_youtube_downloader.utils.config_utils import ConfigUtils
+
+
+class TraceReport:
+	"""Aggregates job traces from traces.jsonl files into p50/p95/p99 durations per stage"""
+
+	@staticmethod
+	def __percentile(sorted_values: list[float], percent: float) -> float:
+		"""Nearest rank percentile"""
+		rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+		return sorted_values[rank - 1]
+
+	@staticmethod
+	def __read_durations(paths: list[str], include_errors: bool) -> dict[str, list[float]]:
+		durations: dict[str, list[float]] = {}
+		for path in paths:
+			with open(path, "r", encoding="utf-8") as file:
+				for line in file:
+					try:
+						record = json.loads(line)
+					except json.JSONDecodeError:
+						continue
+					if not include_errors and record.get("status") != "ok":
+						continue
+					durations.setdefault(record["span"], []).append(record["duration_seconds"])
+		return durations
+
+	@staticmethod
+	def __get_configured_log_path() -> str:
+		"""log_path of the bot config, env overrides included"""
+		ConfigUtils.init_config()
+		return ConfigUtils.get_app_config().logger_options.log_path
+
+	@staticmethod
+	def __get_default_paths(log_path: str) -> list[str]:
+		"""Current trace file and its rotated backups"""
+		if not os.path.isabs(log_path):
+			log_path = os.path.join(os.getcwd(), log_path)
+		if not os.path.isdir(log_path):
+			return []
+		return sorted(
+			os.path.join(log_path, file_name)
+			for file_name in os.listdir(log_path)
+			if file_name.startswith("traces.jsonl")
+		)
+
+	def start(self):
+		parser = argparse.ArgumentParser(
+			description="Job stage duration report",
+			epilog="Reads traces.jsonl and its backups in the log path if no paths passed",
+		)
+		parser.add_argument("paths", metavar="<path>", nargs="*", help="Trace files")
+		parser.add_argument(
+			"-e",
+			"--include_errors",
+			dest="include_errors",
+			action="store_true",
+			help="Include failed spans",
+		)
+		parser.add_argument(
+			"-l",
+			"--log_path",
+			dest="log_path",
+			help="Folder of the trace files, log_path of the config by default",
+		)
+		args = parser.parse_args()
+
+		paths = args.paths or TraceReport.__get_default_paths(
+			args.log_path or TraceReport.__get_configured_log_path()
+		)
+		if not paths:
+			print("No trace files found")
+			sys.exit(1)
+
+		durations = TraceReport.__read_durations(paths, args.include_errors)
+		print(f"{'stage':<40} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+		for span, values in sorted(durations.items()):
+			values.sort()
+			print(
+				f"{span:<40} {len(values):>7} "
+				f"{TraceReport.__percentile(values, 50):>9.3f} "
+				f"{TraceReport.__percentile(values, 95):>9.3f} "
+				f"{TraceReport.__percentile(values, 99):>9.3f} "
+				f"{values[-1]:>9.3f}"
+			)
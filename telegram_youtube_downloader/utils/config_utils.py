@@ -7,12 +7,14 @@ import dacite
 from dacite.config import Config as DaciteConfig
 
 from telegram_youtube_downloader.data.app_config import AppConfig
+from telegram_youtube_downloader.data.downloader_plan import DownloaderPlan
 
 
 class ConfigUtils:
 	__nested_env_key_separator = "__"  # Should not be used in config file keys
 	__config_path = "telegram_youtube_downloader/configs/config.yaml"
 	__app_config: Optional[AppConfig] = None
+	__downloader_plan: Optional[DownloaderPlan] = None
 
 	@staticmethod
 	def __read_cfg_file():
@@ -116,12 +118,21 @@ class ConfigUtils:
 			cfg[current_key], keys, current_key_index + 1, value
 		)
 
+	@staticmethod
+	def __parse_bool(value) -> bool:
+		"""Values set from env are strings, bool('false') would be True"""
+		if isinstance(value, str):
+			return value.strip().lower() in ("true", "1", "yes")
+		return bool(value)
+
 	@staticmethod
 	def __deserialize_config(cfg_dict: dict) -> AppConfig:
 		return dacite.from_dict(
 			data_class=AppConfig,
 			data=cfg_dict,
-			config=DaciteConfig(type_hooks={int: int}, cast=[Enum]),
+			config=DaciteConfig(
+				type_hooks={int: int, float: float, bool: ConfigUtils.__parse_bool}, cast=[Enum]
+			),
 		)
 
 	@staticmethod
@@ -141,6 +152,11 @@ class ConfigUtils:
 		# Deserialize merged config int class
 		ConfigUtils.__app_config = ConfigUtils.__deserialize_config(cfg)
 
+		# Compile downloader options once, so requests do not recompile patterns or rebuild options
+		ConfigUtils.__downloader_plan = DownloaderPlan.compile(
+			ConfigUtils.__app_config.youtube_downloader_options
+		)
+
 	@staticmethod
 	def get_app_config() -> AppConfig:
 		if not ConfigUtils.__app_config:
@@ -148,3 +164,11 @@ class ConfigUtils:
 				f"Config not initialized. Call {ConfigUtils.init_config.__name__} first"
 			)
 		return ConfigUtils.__app_config
+
+	@staticmethod
+	def get_downloader_plan() -> DownloaderPlan:
+		if not ConfigUtils.__downloader_plan:
+			raise Exception(
+				f"Config not initialized. Call {ConfigUtils.init_config.__name__} first"
+			)
+		return ConfigUtils.__downloader_plan
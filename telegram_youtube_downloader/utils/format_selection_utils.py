@@ -0,0 +1,164 @@
+from typing import Any
+
+from telegram_youtube_downloader.utils.size_utils import SizeUtils
+from telegram_youtube_downloader.statics.content_type import ContentType
+
+
+class FormatSelectionUtils:
+	# Codecs that can be copied into the container without re-encoding
+	__remux_codecs: dict[str, tuple[tuple[str, ...], tuple[str, ...]]] = {
+		"mp4": (("avc1", "h264", "hev1", "hvc1", "av01"), ("mp4a", "aac", "mp3")),
+		"webm": (("vp8", "vp9", "vp09", "av01"), ("opus", "vorbis")),
+		"mkv": ((), ()),
+	}
+	# FFmpegExtractAudio codec -> (extension, stream codecs that are copied instead of converted)
+	__extract_audio_codecs: dict[str, tuple[str, tuple[str, ...]]] = {
+		"mp3": ("mp3", ("mp3",)),
+		"aac": ("m4a", ("mp4a", "aac")),
+		"m4a": ("m4a", ("mp4a", "aac")),
+		"opus": ("opus", ("opus",)),
+		"vorbis": ("ogg", ("vorbis",)),
+		"flac": ("flac", ("flac",)),
+	}
+	# Files in these containers are kept as they are by FFmpegExtractAudio with the 'best' codec
+	__common_audio_exts = ("aiff", "alac", "flac", "m4a", "mka", "mp3", "ogg", "opus", "wav", "wma")
+
+	@staticmethod
+	def __is_usable(format_info: dict[str, Any]) -> bool:
+		return "format_id" in format_info and not format_info.get("has_drm")
+
+	@staticmethod
+	def __has_video(format_info: dict[str, Any]) -> bool:
+		return format_info.get("vcodec") not in (None, "none")
+
+	@staticmethod
+	def __has_audio(format_info: dict[str, Any]) -> bool:
+		return format_info.get("acodec") not in (None, "none")
+
+	@staticmethod
+	def __is_codec_in(codec: "str | None", codecs: tuple[str, ...]) -> bool:
+		return codec is not None and codec.split(".")[0].lower() in codecs
+
+	@staticmethod
+	def can_remux(video_codec: "str | None", audio_codec: "str | None", container: str) -> bool:
+		"""Missing streams are ignored, empty codec lists mean the container accepts any codec (mkv)"""
+		if container not in FormatSelectionUtils.__remux_codecs:
+			return False
+		video_codecs, audio_codecs = FormatSelectionUtils.__remux_codecs[container]
+		return (
+			not video_codecs
+			or video_codec in (None, "none")
+			or FormatSelectionUtils.__is_codec_in(video_codec, video_codecs)
+		) and (
+			not audio_codecs
+			or audio_codec in (None, "none")
+			or FormatSelectionUtils.__is_codec_in(audio_codec, audio_codecs)
+		)
+
+	@staticmethod
+	def get_extract_audio_path(
+		ext: "str | None", audio_codec: "str | None", preferred_codec: "str | None"
+	) -> str:
+		"""
+		Returns the path FFmpegExtractAudio takes for a file.
+		none (file is kept), remux (stream is copied into another container) or transcode.
+		"""
+		if preferred_codec in (None, "best"):
+			return "none" if ext in FormatSelectionUtils.__common_audio_exts else "remux"
+
+		target_ext, copy_codecs = FormatSelectionUtils.__extract_audio_codecs.get(
+			preferred_codec, (preferred_codec, ())
+		)
+		if not FormatSelectionUtils.__is_codec_in(audio_codec, copy_codecs):
+			return "transcode"
+		return "none" if ext == target_ext else "remux"
+
+	@staticmethod
+	def __select_video(
+		formats: list[dict[str, Any]], duration: "float | None", max_bytes: int, container: str
+	) -> "str | None":
+		video_formats = [
+			f
+			for f in formats
+			if FormatSelectionUtils.__has_video(f) and not FormatSelectionUtils.__has_audio(f)
+		]
+		audio_formats = [
+			f
+			for f in formats
+			if FormatSelectionUtils.__has_audio(f) and not FormatSelectionUtils.__has_video(f)
+		]
+		combined_formats = [
+			f
+			for f in formats
+			if FormatSelectionUtils.__has_video(f) and FormatSelectionUtils.__has_audio(f)
+		]
+
+		# (video format, audio format), combined formats are paired with themselves
+		pairs = [(v, a) for v in video_formats for a in audio_formats]
+		pairs += [(c, c) for c in combined_formats]
+
+		best_key = None
+		best_spec = None
+		for video_format, audio_format in pairs:
+			if video_format is audio_format:
+				size = SizeUtils.estimate_format_bytes(video_format, duration)
+				spec = str(video_format["format_id"])
+			else:
+				video_size = SizeUtils.estimate_format_bytes(video_format, duration)
+				audio_size = SizeUtils.estimate_format_bytes(audio_format, duration)
+				size = None if video_size is None or audio_size is None else video_size + audio_size
+				spec = f"{video_format['format_id']}+{audio_format['format_id']}"
+			if size is None or size > max_bytes:
+				continue
+
+			# Resolution first, on the same resolution formats that are only remuxed win
+			key = (
+				video_format.get("height") or 0,
+				FormatSelectionUtils.can_remux(
+					video_format.get("vcodec"), audio_format.get("acodec"), container
+				),
+				video_format.get("fps") or 0,
+				(video_format.get("tbr") or 0) + (audio_format.get("abr") or 0),
+			)
+			if best_key is None or key > best_key:
+				best_key = key
+				best_spec = spec
+		return best_spec
+
+	@staticmethod
+	def __select_audio(
+		formats: list[dict[str, Any]], duration: "float | None", max_bytes: int
+	) -> "str | None":
+		audio_formats = [
+			f
+			for f in formats
+			if FormatSelectionUtils.__has_audio(f) and not FormatSelectionUtils.__has_video(f)
+		]
+		# Formats with video are only used if there is no audio only format
+		candidates = audio_formats or [f for f in formats if FormatSelectionUtils.__has_audio(f)]
+
+		best_key = None
+		best_spec = None
+		for audio_format in candidates:
+			size = SizeUtils.estimate_format_bytes(audio_format, duration)
+			if size is None or size > max_bytes:
+				continue
+			key = (audio_format.get("abr") or audio_format.get("tbr") or 0, -size)
+			if best_key is None or key > best_key:
+				best_key = key
+				best_spec = str(audio_format["format_id"])
+		return best_spec
+
+	@staticmethod
+	def select_auto_format(
+		meta: dict[str, Any], content_type: ContentType, max_bytes: int, container: str
+	) -> "str | None":
+		"""
+		Returns a yt_dlp format spec of the best quality format or video+audio pair that fits max_bytes.
+		Formats with unknown size are skipped, returns None if nothing fits.
+		"""
+		formats = [f for f in meta.get("formats") or [] if FormatSelectionUtils.__is_usable(f)]
+		duration = meta.get("duration")
+		if content_type == ContentType.AUDIO:
+			return FormatSelectionUtils.__select_audio(formats, duration, max_bytes)
+		return FormatSelectionUtils.__select_video(formats, duration, max_bytes, container)
@@ -5,6 +5,7 @@ import logging
 import pathlib
 from logging.handlers import RotatingFileHandler
 
+from telegram_youtube_downloader.job_trace import JobTrace
 from telegram_youtube_downloader.utils.config_utils import ConfigUtils
 
 
@@ -51,3 +52,18 @@ class LoggerFactory:
 		file_handler.setFormatter(formatter)
 		root_logger.addHandler(file_handler)
 		app_logger.addHandler(file_handler)
+
+		# trace handler, job traces are written as JSONL to their own file instead of tyd.log
+		trace_logger = logging.getLogger(JobTrace.TRACE_LOGGER_NAME)
+		trace_logger.propagate = False
+		if not cfg.trace_enabled:
+			trace_logger.disabled = True
+			return
+
+		trace_logger.setLevel(logging.INFO)
+		trace_file_path = os.path.join(log_path, "traces.jsonl")
+		trace_handler = RotatingFileHandler(
+			trace_file_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+		)
+		trace_handler.setFormatter(logging.Formatter("%(message)s"))
+		trace_logger.addHandler(trace_handler)
@@ -0,0 +1,165 @@
+import bisect
+import threading
+from typing import Callable
+
+from telegram_youtube_downloader.statics.metric_name import MetricName
+
+
+Labels = tuple[tuple[str, str], ...]
+Sample = tuple[dict[str, str], float]
+
+
+class MetricsUtils:
+	"""
+	In-process metrics registry rendered in Prometheus text format.
+	Recording is a no-op until enabled, so the pipeline does not pay for metrics nobody scrapes.
+	Values that already exist elsewhere (Ex: queue size, cache stats) are read by collectors at scrape time.
+	"""
+
+	__is_enabled = False
+	__lock = threading.Lock()
+	__buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+	__definitions: dict[MetricName, tuple[str, str]] = {
+		MetricName.STAGE_DURATION_SECONDS: ("histogram", "Duration of pipeline stages"),
+		MetricName.POSTPROCESS_PATH_DURATION_SECONDS: (
+			"histogram",
+			"Duration of postprocessing by path (none, remux, transcode, unknown)",
+		),
+		MetricName.TELEGRAM_REQUEST_DURATION_SECONDS: (
+			"histogram",
+			"Duration of Telegram api requests by method",
+		),
+		MetricName.DOWNLOADED_BYTES_TOTAL: ("counter", "Bytes of downloaded media files"),
+		MetricName.UPLOADED_BYTES_TOTAL: ("counter", "Bytes of media files uploaded to Telegram"),
+		MetricName.UPLOAD_ATTEMPTS_TOTAL: (
+			"counter",
+			"Upload attempts by result (ok, retry, failed)",
+		),
+		MetricName.ERRORS_TOTAL: ("counter", "Errors by type"),
+		MetricName.QUEUE_DEPTH: ("gauge", "Download jobs waiting in the queue"),
+		MetricName.ACTIVE_JOBS: ("gauge", "Download jobs running"),
+		MetricName.STAGE_JOBS: ("gauge", "Jobs waiting for or running in a stage pool"),
+		MetricName.CACHE_HITS_TOTAL: ("counter", "Cache hits by cache"),
+		MetricName.CACHE_MISSES_TOTAL: ("counter", "Cache misses by cache"),
+		MetricName.CACHE_HIT_RATIO: ("gauge", "Cache hit ratio by cache"),
+		MetricName.TEMP_STORAGE_RESERVED_BYTES: ("gauge", "Temp storage bytes reserved by jobs"),
+		MetricName.TEMP_STORAGE_USED_BYTES: ("gauge", "Temp storage bytes on disk by root"),
+		MetricName.TEMP_STORAGE_SWEPT_DIRS_TOTAL: ("counter", "Orphan job directories deleted"),
+		MetricName.ADMISSION_REJECTIONS_TOTAL: (
+			"counter",
+			"Downloads rejected before start by reason (upload_limit, temp_storage)",
+		),
+	}
+	__counters: dict[MetricName, dict[Labels, float]] = {}
+	# Labels -> (bucket counts, sum, count)
+	__histograms: dict[MetricName, dict[Labels, tuple[list[int], float, int]]] = {}
+	__collectors: dict[MetricName, list[Callable[[], list[Sample]]]] = {}
+
+	@staticmethod
+	def __to_labels(labels: "dict[str, str] | None") -> Labels:
+		return tuple(sorted((labels or {}).items()))
+
+	@staticmethod
+	def __format_labels(labels: Labels, extra: "tuple[str, str] | None" = None) -> str:
+		items = list(labels) + ([extra] if extra is not None else [])
+		if not items:
+			return ""
+		escaped = []
+		for key, value in items:
+			value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+			escaped.append(f'{key}="{value}"')
+		return "{" + ",".join(escaped) + "}"
+
+	@staticmethod
+	def enable() -> None:
+		MetricsUtils.__is_enabled = True
+
+	@staticmethod
+	def is_enabled() -> bool:
+		return MetricsUtils.__is_enabled
+
+	@staticmethod
+	def inc(name: MetricName, value: float = 1, labels: "dict[str, str] | None" = None) -> None:
+		if not MetricsUtils.__is_enabled:
+			return
+		key = MetricsUtils.__to_labels(labels)
+		with MetricsUtils.__lock:
+			series = MetricsUtils.__counters.setdefault(name, {})
+			series[key] = series.get(key, 0) + value
+
+	@staticmethod
+	def observe(name: MetricName, value: float, labels: "dict[str, str] | None" = None) -> None:
+		if not MetricsUtils.__is_enabled:
+			return
+		key = MetricsUtils.__to_labels(labels)
+		bucket_index = bisect.bisect_left(MetricsUtils.__buckets, value)
+		with MetricsUtils.__lock:
+			series = MetricsUtils.__histograms.setdefault(name, {})
+			bucket_counts, total, count = series.get(
+				key, ([0] * len(MetricsUtils.__buckets), 0.0, 0)
+			)
+			if bucket_index < len(bucket_counts):
+				bucket_counts[bucket_index] += 1
+			series[key] = (bucket_counts, total + value, count + 1)
+
+	@staticmethod
+	def register_collector(name: MetricName, collector: Callable[[], list[Sample]]) -> None:
+		"""Collector is called on every scrape and returns (labels, value) samples"""
+		with MetricsUtils.__lock:
+			MetricsUtils.__collectors.setdefault(name, []).append(collector)
+
+	@staticmethod
+	def register_cache(cache_name: str, get_stats: Callable[[], dict]) -> None:
+		"""Exports hits, misses and hit ratio of a cache that has get_stats with 'hits' and 'misses'"""
+
+		def hits() -> list[Sample]:
+			return [({"cache": cache_name}, get_stats()["hits"])]
+
+		def misses() -> list[Sample]:
+			return [({"cache": cache_name}, get_stats()["misses"])]
+
+		def hit_ratio() -> list[Sample]:
+			stats = get_stats()
+			requests = stats["hits"] + stats["misses"]
+			return [({"cache": cache_name}, stats["hits"] / requests if requests else 0.0)]
+
+		MetricsUtils.register_collector(MetricName.CACHE_HITS_TOTAL, hits)
+		MetricsUtils.register_collector(MetricName.CACHE_MISSES_TOTAL, misses)
+		MetricsUtils.register_collector(MetricName.CACHE_HIT_RATIO, hit_ratio)
+
+	@staticmethod
+	def render() -> str:
+		"""Returns all metrics in Prometheus text exposition format"""
+		with MetricsUtils.__lock:
+			counters = {name: dict(series) for name, series in MetricsUtils.__counters.items()}
+			histograms = {
+				name: {key: (list(b), s, c) for key, (b, s, c) in series.items()}
+				for name, series in MetricsUtils.__histograms.items()
+			}
+			collectors = {name: list(c) for name, c in MetricsUtils.__collectors.items()}
+
+		lines = []
+		for name, (metric_type, help_text) in MetricsUtils.__definitions.items():
+			lines.append(f"# HELP {name.value} {help_text}")
+			lines.append(f"# TYPE {name.value} {metric_type}")
+
+			for key, value in counters.get(name, {}).items():
+				lines.append(f"{name.value}{MetricsUtils.__format_labels(key)} {value}")
+
+			for collector in collectors.get(name, []):
+				for labels, value in collector():
+					key = MetricsUtils.__to_labels(labels)
+					lines.append(f"{name.value}{MetricsUtils.__format_labels(key)} {value}")
+
+			for key, (bucket_counts, total, count) in histograms.get(name, {}).items():
+				cumulative = 0
+				for bucket, bucket_count in zip(MetricsUtils.__buckets, bucket_counts):
+					cumulative += bucket_count
+					le = MetricsUtils.__format_labels(key, ("le", str(bucket)))
+					lines.append(f"{name.value}_bucket{le} {cumulative}")
+				le = MetricsUtils.__format_labels(key, ("le", "+Inf"))
+				lines.append(f"{name.value}_bucket{le} {count}")
+				lines.append(f"{name.value}_sum{MetricsUtils.__format_labels(key)} {total}")
+				lines.append(f"{name.value}_count{MetricsUtils.__format_labels(key)} {count}")
+
+		return "\n".join(lines) + "\n"
@@ -0,0 +1,37 @@
+from typing import Any
+
+
+class SizeUtils:
+	@staticmethod
+	def format_bytes(size: float) -> str:
+		"""Ex: 2.1MiB"""
+		for unit in ("B", "KiB", "MiB"):
+			if size < 1024:
+				return f"{size:.1f}{unit}"
+			size /= 1024
+		return f"{size:.1f}GiB"
+
+	@staticmethod
+	def estimate_format_bytes(
+		format_info: dict[str, Any], duration: "float | None"
+	) -> "int | None":
+		"""
+		Estimates the size of a yt_dlp format from filesize, filesize_approx or total bitrate (kbps) x duration.
+		Merged formats are estimated as the sum of their requested formats, returns None if any part is unknown.
+		"""
+		requested_formats = format_info.get("requested_formats")
+		if requested_formats:
+			sizes = [SizeUtils.estimate_format_bytes(f, duration) for f in requested_formats]
+			if any(size is None for size in sizes):
+				return None
+			return sum(size for size in sizes if size is not None)
+
+		size = format_info.get("filesize") or format_info.get("filesize_approx")
+		if size:
+			return int(size)
+
+		bitrate = format_info.get("tbr")
+		if bitrate and duration:
+			return int(bitrate * 1000 / 8 * duration)
+
+		return None
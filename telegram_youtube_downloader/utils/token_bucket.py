@@ -0,0 +1,41 @@
+import time
+
+
+class TokenBucket:
+	"""Token bucket refilled at rate tokens per second up to capacity, used from the event loop only"""
+
+	def __init__(self, rate: float, capacity: float) -> None:
+		self.__rate = rate
+		self.__capacity = capacity
+		self.__tokens = capacity
+		self.__updated_at = time.monotonic()
+		self.__paused_until = 0.0
+
+	def __refill(self, now: float) -> None:
+		self.__tokens = min(
+			self.__capacity, self.__tokens + (now - self.__updated_at) * self.__rate
+		)
+		self.__updated_at = now
+
+	def get_wait_seconds(self) -> float:
+		"""Returns 0 if a token can be taken, otherwise seconds until one is available"""
+		now = time.monotonic()
+		if now < self.__paused_until:
+			return self.__paused_until - now
+		self.__refill(now)
+		if self.__tokens >= 1:
+			return 0.0
+		return (1 - self.__tokens) / self.__rate
+
+	def take(self) -> None:
+		self.__tokens -= 1
+
+	def pause(self, seconds: float) -> None:
+		"""No tokens are given until the pause ends, Ex: after a 429 response"""
+		self.__paused_until = max(self.__paused_until, time.monotonic() + seconds)
+
+	def is_idle(self) -> bool:
+		"""Full and not paused, so it can be dropped and recreated without changing behavior"""
+		now = time.monotonic()
+		self.__refill(now)
+		return self.__tokens >= self.__capacity and now >= self.__paused_until
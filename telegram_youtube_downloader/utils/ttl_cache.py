@@ -0,0 +1,57 @@
+import time
+import threading
+from typing import Any, Optional
+from collections import OrderedDict
+
+
+class TtlCache:
+	"""Thread safe in-process cache with per entry ttl and least recently used eviction"""
+
+	def __init__(self, max_size: int, ttl_seconds: float) -> None:
+		self.__max_size = max_size
+		self.__ttl_seconds = ttl_seconds
+		self.__entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+		self.__lock = threading.Lock()
+		self.__hits = 0
+		self.__misses = 0
+		self.__evictions = 0
+
+	def get(self, key: str) -> Optional[Any]:
+		"""Returns the value or None if the key is missing or expired"""
+		with self.__lock:
+			entry = self.__entries.get(key)
+			if entry is None:
+				self.__misses += 1
+				return None
+
+			expires_at, value = entry
+			if expires_at <= time.monotonic():
+				del self.__entries[key]
+				self.__misses += 1
+				return None
+
+			self.__entries.move_to_end(key)
+			self.__hits += 1
+			return value
+
+	def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+		"""Adds or replaces a value, evicts least recently used entries over max size"""
+		if self.__max_size <= 0:
+			return
+
+		ttl = self.__ttl_seconds if ttl_seconds is None else ttl_seconds
+		with self.__lock:
+			self.__entries[key] = (time.monotonic() + ttl, value)
+			self.__entries.move_to_end(key)
+			while len(self.__entries) > self.__max_size:
+				self.__entries.popitem(last=False)
+				self.__evictions += 1
+
+	def get_stats(self) -> dict[str, int]:
+		with self.__lock:
+			return {
+				"size": len(self.__entries),
+				"hits": self.__hits,
+				"misses": self.__misses,
+				"evictions": self.__evictions,
+			}
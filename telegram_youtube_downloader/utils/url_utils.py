@@ -0,0 +1,48 @@
+import re
+from urllib.parse import urlsplit, parse_qsl, urlencode, urlunsplit
+
+
+class UrlUtils:
+	__youtube_hosts = ("youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com")
+	__youtube_path_id_re = re.compile(r"^/(?:shorts|embed|live|v)/([A-Za-z0-9_-]{11})")
+	__youtube_short_host = "youtu.be"
+	__youtube_watch_url = "https://www.youtube.com/watch?v="
+	__tracking_param_prefixes = ("utm_",)
+	__tracking_params = {"si", "feature", "fbclid", "gclid"}
+
+	@staticmethod
+	def __get_youtube_id(host: str, path: str, query: list[tuple[str, str]]) -> "str | None":
+		if host == UrlUtils.__youtube_short_host:
+			video_id = path.strip("/").split("/")[0]
+			return video_id or None
+
+		if host in UrlUtils.__youtube_hosts:
+			if path == "/watch":
+				return dict(query).get("v")
+			match = UrlUtils.__youtube_path_id_re.match(path)
+			if match:
+				return match.group(1)
+
+		return None
+
+	@staticmethod
+	def normalize_url(url: str) -> str:
+		"""
+		Normalizes a url to use as a cache key.
+		YouTube video urls are converted to the watch url, other urls get a lowercase scheme and host,
+		fragments and tracking parameters are removed.
+		"""
+		parts = urlsplit(url.strip())
+		host = parts.netloc.lower()
+		query = [
+			(key, value)
+			for key, value in parse_qsl(parts.query, keep_blank_values=True)
+			if key not in UrlUtils.__tracking_params
+			and not key.startswith(UrlUtils.__tracking_param_prefixes)
+		]
+
+		youtube_id = UrlUtils.__get_youtube_id(host, parts.path, query)
+		if youtube_id:
+			return f"{UrlUtils.__youtube_watch_url}{youtube_id}"
+
+		return urlunsplit((parts.scheme.lower(), host, parts.path, urlencode(query), ""))
@@ -1,6 +1,4 @@
 import os
-import uuid
-import pathlib
 from typing import Any
 
 from telegram_youtube_downloader.utils.config_utils import ConfigUtils
@@ -8,43 +6,20 @@ from telegram_youtube_downloader.statics.content_type import ContentType
 
 
 class YoutubeDlOptions:
-	def __init__(self):
-		self.__youtube_dl_options = ConfigUtils.get_app_config().youtube_downloader_options
+	def __init__(self, content_type: ContentType, save_dir: str):
+		base_options = ConfigUtils.get_downloader_plan().base_options[content_type]
 
-		save_dir = self.__get_random_dir_path()
-		self.__audio_options = {
-			# Spread values from config file
-			**self.__youtube_dl_options.audio_options,
+		# save_dir is created by yt_dlp when the first file is written
+		self.__options = {
+			# Prebuilt options from the downloader plan
+			**base_options,
 			"outtmpl": os.path.join(save_dir, "TEMP.%(ext)s"),
 			# For custom downloader class
-			"content_type": ContentType.AUDIO,
 			"save_dir": save_dir,
-			"max_duration_seconds": self.__youtube_dl_options.max_audio_duration_seconds,
 		}
 
-		self.__video_options = {
-			# Spread values from config file
-			**self.__youtube_dl_options.video_options,
-			"outtmpl": os.path.join(save_dir, "TEMP.%(ext)s"),
-			# For custom downloader class
-			"content_type": ContentType.VIDEO,
-			"save_dir": save_dir,
-			"max_duration_seconds": self.__youtube_dl_options.max_video_duration_seconds,
-		}
-
-	def __get_random_dir_path(self):
-		path = os.path.join("temp", str(uuid.uuid4()))
-		pathlib.Path(path).mkdir(parents=True, exist_ok=True)
-		return path
-
-	def set_format(self, content_type: ContentType, fmt: str):
-		if content_type == content_type.VIDEO:
-			self.__video_options.update({"format": f"({fmt})"})
-		if content_type == content_type.AUDIO:
-			self.__audio_options.update({"format": f"({fmt})"})
+	def set_format(self, fmt: str):
+		self.__options.update({"format": f"({fmt})"})
 
-	def get_for_content_type(self, content_type: ContentType) -> dict[str, Any]:
-		if content_type == ContentType.VIDEO:
-			return self.__video_options
-		if content_type == ContentType.AUDIO:
-			return self.__audio_options
+	def get(self) -> dict[str, Any]:
+		return self.__options
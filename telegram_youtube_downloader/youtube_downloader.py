@@ -1,36 +1,62 @@
 import os
-import re
-import shutil
+import copy
+import time
 import logging
 import pathlib
 import datetime
-from typing import Any, cast
+from typing import Any, Callable, cast
 
 import yt_dlp as yt
 from yt_dlp.utils import DownloadError as YtDlpDownloadError
+from yt_dlp.utils import ReExtractInfo
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
 
+from telegram_youtube_downloader.job_trace import JobTrace
+from telegram_youtube_downloader.temp_storage import TempStorage
 from telegram_youtube_downloader.data.dl_format import DlFormat
+from telegram_youtube_downloader.data.media_info import MediaInfo
+from telegram_youtube_downloader.data.media_part import MediaPart
+from telegram_youtube_downloader.media_segmenter import MediaSegmenter
+from telegram_youtube_downloader.utils.ttl_cache import TtlCache
+from telegram_youtube_downloader.utils.url_utils import UrlUtils
+from telegram_youtube_downloader.utils.size_utils import SizeUtils
 from telegram_youtube_downloader.utils.config_utils import ConfigUtils
 from telegram_youtube_downloader.youtube_dl_options import YoutubeDlOptions
+from telegram_youtube_downloader.statics.metric_name import MetricName
+from telegram_youtube_downloader.storage_reservation import StorageReservation
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
 from telegram_youtube_downloader.statics.content_type import ContentType
+from telegram_youtube_downloader.data.downloaded_media import DownloadedMedia
 from telegram_youtube_downloader.errors.download_error import DownloadError
+from telegram_youtube_downloader.data.download_progress import DownloadProgress
 from telegram_youtube_downloader.data.downloader_result import DownloaderResult
 from telegram_youtube_downloader.utils.sanitization_utils import SanitizationUtils
+from telegram_youtube_downloader.data.metadata_cache_entry import MetadataCacheEntry
+from telegram_youtube_downloader.utils.format_selection_utils import FormatSelectionUtils
 
 
 class YoutubeDownloader:
-	def __init__(self) -> None:
+	__bot_api_upload_limit_bytes = 50_000_000
+	__local_bot_api_upload_limit_bytes = 2_000_000_000
+
+	def __init__(self, temp_storage: TempStorage) -> None:
+		self.__temp_storage = temp_storage
+		self.__segmenter = MediaSegmenter()
 		self.__download_options = ConfigUtils.get_app_config().youtube_downloader_options
+		self.__plan = ConfigUtils.get_downloader_plan()
 		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
+		cache_options = self.__download_options.metadata_cache_options
+		self.__metadata_cache = TtlCache(cache_options.max_size, cache_options.ttl_seconds)
+		MetricsUtils.register_cache("metadata", self.__metadata_cache.get_stats)
+		# Failures depend on the requested format too, so they are cached apart from the metadata
+		self.__metadata_error_cache = TtlCache(
+			cache_options.max_size, cache_options.negative_ttl_seconds
+		)
+		MetricsUtils.register_cache("metadata_error", self.__metadata_error_cache.get_stats)
 
 	def __is_allowed_url(self, url: str) -> bool:
 		"""Checks if provided url is on the allowed url list"""
-		allowed_patterns = self.__download_options.allowed_url_patterns
-		matches = []
-		for allowed_pattern in allowed_patterns:
-			compiled_pattern = re.compile(allowed_pattern.pattern)
-			matches.append(compiled_pattern.match(url))
-		return any(matches)
+		return self.__plan.is_allowed_url(url)
 
 	def __get_downloaded_file_path(self, folder_path: str) -> str:
 		"""
@@ -53,26 +79,313 @@ class YoutubeDownloader:
 
 		return downloaded_file_path
 
-	def __perform_download(self, url: str, options: dict[str, Any]) -> DownloaderResult:
-		"""Download base for different content types"""
+	def __extract_info(
+		self, ydl: yt.YoutubeDL, url: str, options: dict[str, Any], trace: JobTrace
+	) -> dict[str, Any]:
+		"""
+		Returns metadata of the url from the cache or extracts it.
+		Failed extractions are cached for a shorter time, so unsupported urls are not extracted again and again.
+		Extraction also selects the format of the job, so failures are cached per content type and format.
+		"""
+		cache_key = UrlUtils.normalize_url(url)
+		error_cache_key = f"{cache_key}|{options['content_type'].value}|{options['format']}"
+		error: str | None = self.__metadata_error_cache.get(error_cache_key)
+		if error is not None:
+			self.__logger.info(f"Metadata error cache hit for '{error_cache_key}'")
+			trace.add_span("extract", time.time(), time.time(), cache_hit=True)
+			raise DownloadError(error)
+
+		entry: MetadataCacheEntry | None = self.__metadata_cache.get(cache_key)
+		if entry is not None:
+			self.__logger.info(
+				f"Metadata cache hit for '{cache_key}', {self.__metadata_cache.get_stats()}"
+			)
+			trace.add_span("extract", time.time(), time.time(), cache_hit=True)
+			return cast(dict[str, Any], entry.meta)
+
+		self.__logger.info(
+			f"Metadata cache miss for '{cache_key}', {self.__metadata_cache.get_stats()}"
+		)
+		extract_start = time.time()
+		with trace.span("extract", cache_hit=False):
+			try:
+				meta = cast(dict[str, Any], ydl.extract_info(url, download=False))
+			except YtDlpDownloadError as de:
+				self.__logger.warning(str(de))
+				error = "Download error (yt_dlp download error)"
+				self.__metadata_error_cache.set(error_cache_key, error)
+				raise DownloadError(error)
+
+			if not isinstance(meta, dict):
+				self.__logger.error("Cannot extract video metadata")
+				error = "Cannot extract video metadata"
+				self.__metadata_error_cache.set(error_cache_key, error)
+				raise DownloadError(error)
+
+		MetricsUtils.observe(
+			MetricName.STAGE_DURATION_SECONDS, time.time() - extract_start, {"stage": "extract"}
+		)
+		self.__metadata_cache.set(cache_key, MetadataCacheEntry(meta=meta))
+		return meta
+
+	def __get_max_upload_bytes(self) -> int:
+		"""Configured limit or the Telegram limit, local api servers accept bigger files"""
+		max_upload_bytes = self.__download_options.admission_options.max_upload_bytes
+		if max_upload_bytes is not None:
+			return max_upload_bytes
+		if ConfigUtils.get_app_config().telegram_bot_options.base_url is None:
+			return YoutubeDownloader.__bot_api_upload_limit_bytes
+		return YoutubeDownloader.__local_bot_api_upload_limit_bytes
+
+	def __select_format(
+		self, ydl: yt.YoutubeDL, meta: dict[str, Any], format_spec: str
+	) -> "dict[str, Any] | None":
+		"""
+		Returns the format that will be downloaded, merged formats have their parts in requested_formats.
+		Cached metadata may have been selected with another format, so the selection is done again.
+		"""
+		formats = meta.get("formats")
+		if not formats:
+			return meta
+
+		try:
+			selector = ydl.build_format_selector(format_spec)
+			# Same context yt_dlp builds for format selection
+			selected_formats = list(
+				selector(
+					{
+						"formats": formats,
+						"has_merged_format": any(
+							"none" not in (f.get("acodec"), f.get("vcodec")) for f in formats
+						),
+						"incomplete_formats": all(f.get("vcodec") == "none" for f in formats)
+						or all(f.get("acodec") == "none" for f in formats),
+					}
+				)
+			)
+		except Exception:
+			self.__logger.warning(f"Cannot select formats for '{format_spec}'", exc_info=True)
+			return None
+
+		if not selected_formats:
+			return None
+		return selected_formats[0]
+
+	def __estimate_download_bytes(
+		self, ydl: yt.YoutubeDL, meta: dict[str, Any], format_spec: str
+	) -> "int | None":
+		selected_format = self.__select_format(ydl, meta, format_spec)
+		if selected_format is None:
+			return None
+		return SizeUtils.estimate_format_bytes(selected_format, meta.get("duration"))
+
+	def __select_auto_format(
+		self, meta: dict[str, Any], options: dict[str, Any], trace: JobTrace
+	) -> None:
+		"""
+		Replaces the format of the job with the best one that fits the upload limit.
+		The configured format value is kept if no format has a known size that fits.
+		"""
+		admission_options = self.__download_options.admission_options
+		max_bytes = int(self.__get_max_upload_bytes() * admission_options.auto_format_size_ratio)
+		container = options.get("merge_output_format") or "mp4"
+		with trace.span("auto_format") as attributes:
+			format_spec = FormatSelectionUtils.select_auto_format(
+				meta, options["content_type"], max_bytes, container
+			)
+			attributes["format_spec"] = format_spec
+
+		if format_spec is None:
+			self.__logger.info(
+				f"No format fits {max_bytes} bytes, using the configured format {options['format']}"
+			)
+			return
+
+		self.__logger.info(f"Auto format selected '{format_spec}' to fit {max_bytes} bytes")
+		options["format"] = format_spec
+
+	def __plan_video_postprocessors(
+		self, selected_format: "dict[str, Any] | None", options: dict[str, Any]
+	) -> str:
+		"""Replaces the video convertor with a remuxer if the selected codecs can be copied into the target container"""
+		postprocessors: list[dict[str, Any]] = options.get("postprocessors") or []
+		convertor = next(
+			(pp for pp in postprocessors if pp.get("key") == "FFmpegVideoConvertor"), None
+		)
+		if convertor is None:
+			return "none"
+
+		# Only plain extensions, conversion rules like 'webm>mp4' are left to the convertor
+		target_ext = str(convertor.get("preferedformat", ""))
+		if not target_ext.isalnum() or selected_format is None:
+			return "unknown"
+		if selected_format.get("ext") == target_ext:
+			return "none"
+		if not FormatSelectionUtils.can_remux(
+			selected_format.get("vcodec"), selected_format.get("acodec"), target_ext
+		):
+			return "transcode"
+
+		# Base options are shared between jobs, so the list is replaced instead of changed
+		options["postprocessors"] = [
+			{**pp, "key": "FFmpegVideoRemuxer"} if pp is convertor else pp for pp in postprocessors
+		]
+		return "remux"
+
+	def __plan_audio_postprocessors(
+		self,
+		selected_format: "dict[str, Any] | None",
+		options: dict[str, Any],
+		dl_format: DlFormat,
+	) -> str:
+		"""Applies the codec of the format to the audio extractor, streams are copied unless a codec is set"""
+		postprocessors: list[dict[str, Any]] = options.get("postprocessors") or []
+		extractor = next(
+			(pp for pp in postprocessors if pp.get("key") == "FFmpegExtractAudio"), None
+		)
+		if extractor is None:
+			return "none"
+
+		preferred_codec = dl_format.audio_codec or extractor.get("preferredcodec")
+		if dl_format.audio_codec is not None:
+			# Base options are shared between jobs, so the list is replaced instead of changed
+			options["postprocessors"] = [
+				{**pp, "preferredcodec": preferred_codec} if pp is extractor else pp
+				for pp in postprocessors
+			]
+
+		if selected_format is None:
+			return "unknown"
+		return FormatSelectionUtils.get_extract_audio_path(
+			selected_format.get("ext"), selected_format.get("acodec"), preferred_codec
+		)
+
+	def __plan_postprocessors(
+		self, ydl: yt.YoutubeDL, meta: dict[str, Any], options: dict[str, Any], dl_format: DlFormat
+	) -> str:
+		"""
+		Picks the cheapest postprocessing for the selected format.
+		Returns the path the job takes, none (file is kept), remux, transcode or unknown.
+		"""
+		selected_format = self.__select_format(ydl, meta, options["format"])
+		if options["content_type"] == ContentType.AUDIO:
+			return self.__plan_audio_postprocessors(selected_format, options, dl_format)
+		return self.__plan_video_postprocessors(selected_format, options)
+
+	def __admit(
+		self,
+		ydl: yt.YoutubeDL,
+		meta: dict[str, Any],
+		options: dict[str, Any],
+		storage_reservation: StorageReservation,
+		trace: JobTrace,
+	) -> None:
+		"""
+		Rejects downloads that would not fit the upload limit, resizes the storage reservation to the estimated size.
+		Downloads with unknown size are admitted with the default reservation.
+		"""
+		admission_options = self.__download_options.admission_options
+		if not admission_options.enabled:
+			return
+
+		content_type: ContentType = options["content_type"]
+		with trace.span("admission") as attributes:
+			estimated_bytes = self.__estimate_download_bytes(ydl, meta, options["format"])
+			attributes["estimated_bytes"] = estimated_bytes
+
+		if estimated_bytes is None:
+			self.__logger.info("Download size is unknown, admitted with the default reservation")
+			return
+
+		# Files over the limit are split into parts if segmenting is enabled
+		max_upload_bytes = self.__get_max_upload_bytes()
+		segment_options = self.__download_options.segment_options
+		if segment_options.enabled:
+			max_upload_bytes *= segment_options.max_parts
+		if estimated_bytes > max_upload_bytes:
+			MetricsUtils.inc(
+				MetricName.ADMISSION_REJECTIONS_TOTAL, labels={"reason": "upload_limit"}
+			)
+			raise DownloadError(
+				f"File is too big to send, estimated {SizeUtils.format_bytes(estimated_bytes)} and the limit is {SizeUtils.format_bytes(max_upload_bytes)}, try a lower quality format"
+			)
+
+		# Separately downloaded streams and the merged or converted file are on disk at the same time
+		try:
+			self.__temp_storage.resize(
+				storage_reservation,
+				content_type,
+				int(estimated_bytes * admission_options.temp_space_factor),
+				admission_options.storage_wait_seconds,
+			)
+		except DownloadError:
+			MetricsUtils.inc(
+				MetricName.ADMISSION_REJECTIONS_TOTAL, labels={"reason": "temp_storage"}
+			)
+			raise
+
+	@staticmethod
+	def __get_postprocessor_hook(trace: JobTrace) -> Callable[[dict[str, Any]], None]:
+		"""Each postprocessor is traced, merging and fixups run in the download stage, the rest in the postprocess stage"""
+		postprocess_starts: dict[str, float] = {}
+
+		def postprocessor_hook(d: dict[str, Any]) -> None:
+			postprocessor = d.get("postprocessor", "Unknown")
+			if d["status"] == "started":
+				postprocess_starts[postprocessor] = time.time()
+			elif d["status"] == "finished" and postprocessor in postprocess_starts:
+				trace.add_span(
+					f"postprocess:{postprocessor}", postprocess_starts[postprocessor], time.time()
+				)
+
+		return postprocessor_hook
+
+	@staticmethod
+	def __get_progress_hook(
+		on_progress: "Callable[[DownloadProgress], None] | None",
+	) -> Callable[[dict[str, Any]], None]:
+		def progress_hook(d: dict[str, Any]) -> None:
+			if on_progress is None:
+				return
+			progress = DownloadProgress.from_hook_dict(d)
+			if progress is not None:
+				on_progress(progress)
+
+		return progress_hook
+
+	def __perform_download(
+		self,
+		url: str,
+		options: dict[str, Any],
+		dl_format: DlFormat,
+		storage_reservation: StorageReservation,
+		trace: JobTrace,
+		on_progress: "Callable[[DownloadProgress], None] | None",
+	) -> DownloadedMedia:
+		"""Download base for different content types, configured postprocessors are left to the postprocess stage"""
 		self.__logger.info(f"Downloading from url: {url} with options: {options}")
 
 		# Check the url
-		match = self.__is_allowed_url(url)
+		with trace.span("url_check"):
+			match = self.__is_allowed_url(url)
 		if not match:
 			self.__logger.warning(f"Url is not on the allowed url list '{url}'")
+			storage_reservation.release()
 			raise DownloadError("Url is not on the allowed url list")
 
+		progress_hook = YoutubeDownloader.__get_progress_hook(on_progress)
+		options["postprocessor_hooks"] = [
+			YoutubeDownloader.__get_postprocessor_hook(trace),
+			progress_hook,
+		]
+		options["progress_hooks"] = [progress_hook]
+
 		# Start download stage
 		try:
 			# options is dynamic so we cast it
 			with yt.YoutubeDL(cast(Any, options)) as ydl:
 				# Get video info for checking duration
-				meta = ydl.extract_info(url, download=False)
-
-				if not isinstance(meta, dict):
-					self.__logger.error("Cannot extract video metadata")
-					raise DownloadError("Cannot extract video metadata")
+				meta = self.__extract_info(ydl, url, options, trace)
 
 				max_duration = options["max_duration_seconds"]
 				content_type = options["content_type"]
@@ -85,64 +398,253 @@ class YoutubeDownloader:
 						f"Maximum allowed video duration for '{content_type.value}' download is {str(datetime.timedelta(seconds=max_duration))}"
 					)
 
-				# Download
-				meta = ydl.extract_info(url, download=True)
-				meta = ydl.sanitize_info(meta)
-
-				if not isinstance(meta, dict):
+				if dl_format.is_auto:
+					self.__select_auto_format(meta, options, trace)
+
+				# Check the estimated size before downloading
+				self.__admit(ydl, meta, options, storage_reservation, trace)
+
+				postprocess_path = self.__plan_postprocessors(ydl, meta, options, dl_format)
+				self.__logger.info(f"Postprocess path for url {url} is '{postprocess_path}'")
+
+			# yt_dlp reads the format and postprocessors when it is created, they are final now
+			# Configured postprocessors are removed, they run on the postprocess pool
+			with yt.YoutubeDL(cast(Any, {**options, "postprocessors": []})) as ydl:
+				# Download with the already extracted info instead of resolving the url again
+				# yt_dlp updates the info while processing, so the cached one is copied
+				download_start = time.time()
+				try:
+					meta = ydl.process_ie_result(cast(Any, copy.deepcopy(meta)), download=True)
+				except ReExtractInfo:
+					self.__logger.info(f"Extracted info expired, extracting again for url: {url}")
+					meta = ydl.extract_info(url, download=True)
+				download_end = time.time()
+
+				if not isinstance(meta, dict) or not meta.get("requested_downloads"):
 					self.__logger.error("Cannot extract video metadata")
 					raise DownloadError("Cannot extract video metadata")
 
-				# Get saved file path
-				downloaded_file_path = self.__get_downloaded_file_path(options["save_dir"])
-
-				# Build sanitized title
-				file_extension = pathlib.Path(downloaded_file_path).suffix or ""
-				title = f"{meta.get('title', 'Unknown')}{file_extension}"
-				sanitized_title = SanitizationUtils.sanitize_filename(title)
-
-				# Build response
-				result = DownloaderResult(file_path=downloaded_file_path, file_name=sanitized_title)
-
-				return result
+				downloaded_bytes = sum(
+					os.path.getsize(os.path.join(options["save_dir"], file_name))
+					for file_name in os.listdir(options["save_dir"])
+				)
+				MetricsUtils.observe(
+					MetricName.STAGE_DURATION_SECONDS,
+					download_end - download_start,
+					{"stage": "download"},
+				)
+				MetricsUtils.inc(
+					MetricName.DOWNLOADED_BYTES_TOTAL,
+					downloaded_bytes,
+					{"content_type": content_type.value},
+				)
+				trace.add_span(
+					"download",
+					download_start,
+					download_end,
+					bytes=downloaded_bytes,
+					format_id=meta.get("format_id"),
+					format=meta.get("format"),
+					postprocess_path=postprocess_path,
+				)
+
+				# Info of the downloaded file, top level info has the selected format merged in
+				info: dict[str, Any] = {**meta, **cast(Any, meta)["requested_downloads"][0]}
+				return DownloadedMedia(
+					info=info,
+					options=options,
+					storage_reservation=storage_reservation,
+					postprocess_path=postprocess_path,
+				)
 
 		# Delete folder on exception
 		except YtDlpDownloadError as de:
 			self.__logger.warning(str(de))
-			self.__logger.info(f"Deleting folder {options['save_dir']}")
-			shutil.rmtree(options["save_dir"], ignore_errors=True)
+			storage_reservation.release()
 			raise DownloadError("Download error (yt_dlp download error)")
 		except DownloadError as de:
 			self.__logger.warning(str(de))
-			self.__logger.info(f"Deleting folder {options['save_dir']}")
-			shutil.rmtree(options["save_dir"], ignore_errors=True)
+			storage_reservation.release()
 			raise de
 		except Exception:
 			self.__logger.error("Unknown error", exc_info=True)
-			self.__logger.info(f"Deleting folder {options['save_dir']}")
-			shutil.rmtree(options["save_dir"], ignore_errors=True)
+			storage_reservation.release()
 			raise DownloadError()
 
+	def __get_postprocess_options(self, downloaded: DownloadedMedia) -> dict[str, Any]:
+		"""ffmpeg thread count is added to the postprocessor arguments if set"""
+		options = dict(downloaded.options)
+		ffmpeg_threads = (
+			ConfigUtils.get_app_config().download_queue_options.stage_options.ffmpeg_threads
+		)
+		if ffmpeg_threads > 0:
+			postprocessor_args = dict(options.get("postprocessor_args") or {})
+			postprocessor_args["ffmpeg"] = [
+				*postprocessor_args.get("ffmpeg", []),
+				"-threads",
+				str(ffmpeg_threads),
+			]
+			options["postprocessor_args"] = postprocessor_args
+		return options
+
+	def __segment(
+		self,
+		ffmpeg_path: str,
+		file_path: str,
+		info: dict[str, Any],
+		content_type: ContentType,
+		title: str,
+		storage_reservation: StorageReservation,
+		trace: JobTrace,
+	) -> list[MediaPart]:
+		"""
+		Splits a file over the upload limit, part names have the part number. Ex: title (1 of 3).mp4
+		The file and its parts are on disk at the same time, so the reservation is resized to fit both first.
+		"""
+		reserved_bytes = max(storage_reservation.reserved_bytes, 2 * os.path.getsize(file_path))
+		self.__temp_storage.resize(
+			storage_reservation,
+			content_type,
+			reserved_bytes,
+			self.__download_options.admission_options.storage_wait_seconds,
+		)
+
+		max_upload_bytes = self.__get_max_upload_bytes()
+		segment_start = time.time()
+		with trace.span("segment") as attributes:
+			part_paths = self.__segmenter.segment(
+				ffmpeg_path, file_path, info, content_type, max_upload_bytes
+			)
+			attributes["parts"] = len(part_paths)
+		MetricsUtils.observe(
+			MetricName.STAGE_DURATION_SECONDS, time.time() - segment_start, {"stage": "segment"}
+		)
+
+		file_extension = pathlib.Path(file_path).suffix or ""
+		return [
+			MediaPart(
+				file_path=part_path,
+				file_name=SanitizationUtils.sanitize_filename(
+					f"{title} ({index} of {len(part_paths)}){file_extension}"
+				),
+				filesize=os.path.getsize(part_path),
+			)
+			for index, part_path in enumerate(part_paths, start=1)
+		]
+
+	def __perform_postprocess(
+		self,
+		downloaded: DownloadedMedia,
+		trace: JobTrace,
+		on_progress: "Callable[[DownloadProgress], None] | None",
+	) -> DownloaderResult:
+		"""Runs the configured postprocessors on the downloaded file and builds the result"""
+		options = self.__get_postprocess_options(downloaded)
+		progress_hook = YoutubeDownloader.__get_progress_hook(on_progress)
+		options["postprocessor_hooks"] = [
+			YoutubeDownloader.__get_postprocessor_hook(trace),
+			progress_hook,
+		]
+		options["progress_hooks"] = [progress_hook]
+		storage_reservation = downloaded.storage_reservation
+
+		try:
+			with yt.YoutubeDL(cast(Any, options)) as ydl:
+				postprocess_start = time.time()
+				info = cast(
+					dict[str, Any],
+					ydl.run_all_pps("post_process", cast(Any, copy.copy(downloaded.info))),
+				)
+				postprocess_end = time.time()
+				ffmpeg_path = FFmpegPostProcessor(ydl).executable
+
+			MetricsUtils.observe(
+				MetricName.STAGE_DURATION_SECONDS,
+				postprocess_end - postprocess_start,
+				{"stage": "postprocess"},
+			)
+			MetricsUtils.observe(
+				MetricName.POSTPROCESS_PATH_DURATION_SECONDS,
+				postprocess_end - postprocess_start,
+				{"path": downloaded.postprocess_path},
+			)
+
+			# Get saved file path
+			with trace.span("file_lookup"):
+				downloaded_file_path = self.__get_downloaded_file_path(options["save_dir"])
+
+			# Keep only the needed fields, final extension and size come from the downloaded file
+			file_extension = pathlib.Path(downloaded_file_path).suffix or ""
+			media_info = MediaInfo.from_info_dict(info)
+			media_info.ext = file_extension.lstrip(".")
+			media_info.filesize = os.path.getsize(downloaded_file_path)
+			# Build sanitized title
+			title = f"{media_info.title}{file_extension}"
+			sanitized_title = SanitizationUtils.sanitize_filename(title)
+
+			# Estimates can be wrong or missing, the final file is checked again before the upload
+			parts: list[MediaPart] = []
+			max_upload_bytes = self.__get_max_upload_bytes()
+			if media_info.filesize > max_upload_bytes:
+				if not self.__download_options.segment_options.enabled:
+					raise DownloadError(
+						f"File is too big to send, {SizeUtils.format_bytes(media_info.filesize)} and the limit is {SizeUtils.format_bytes(max_upload_bytes)}, try a lower quality format"
+					)
+				if ffmpeg_path is None:
+					self.__logger.error("ffmpeg is not found, cannot split the file")
+					raise DownloadError("Cannot split the file")
+				parts = self.__segment(
+					ffmpeg_path,
+					downloaded_file_path,
+					info,
+					options["content_type"],
+					media_info.title,
+					storage_reservation,
+					trace,
+				)
+
+			# Build response
+			result = DownloaderResult(
+				file_path=downloaded_file_path,
+				file_name=sanitized_title,
+				media_info=media_info,
+				storage_reservation=storage_reservation,
+				parts=parts,
+			)
+
+			return result
+
+		# Delete folder on exception
+		except DownloadError as de:
+			self.__logger.warning(str(de))
+			storage_reservation.release()
+			raise de
+		except Exception:
+			self.__logger.error("Unknown error", exc_info=True)
+			storage_reservation.release()
+			raise DownloadError("Postprocessing error")
+
 	def __get_download_format_from_name(
 		self, content_type: ContentType, format_name: str
 	) -> DlFormat:
 		"""Returns full format dict for a format name, raises DownloadError if format is not supported. Ex: ({name: test, value: 'best/best', is_default: false})"""
-		dl_formats = self.__download_options.formats.from_string(content_type.value)
-		for dl_format in dl_formats:
-			if dl_format.name == format_name:
-				return dl_format
+		dl_format = self.__plan.get_format(content_type, format_name)
+		if dl_format is not None:
+			return dl_format
 		self.__logger.warning(f"{content_type.value} format '{format_name}' is not supported")
 		raise DownloadError(f"{content_type.value} format '{format_name}' is not supported")
 
 	def __get_default_download_format(self, content_type: ContentType) -> DlFormat:
 		"""Returns the default format for a content type, raises DownloadError if no default is set"""
-		dl_formats = self.__download_options.formats.from_string(content_type.value)
-		for dl_format in dl_formats:
-			if dl_format.is_default:
-				return dl_format
+		dl_format = self.__plan.get_default_format(content_type)
+		if dl_format is not None:
+			return dl_format
 		self.__logger.error(f"No default format configured for {content_type.value}")
 		raise DownloadError(f"No default format configured for {content_type.value}")
 
+	def is_allowed_url(self, url: str) -> bool:
+		return self.__is_allowed_url(url)
+
 	def get_max_video_duration(self) -> str:
 		return str(datetime.timedelta(seconds=self.__download_options.max_video_duration_seconds))
 
@@ -166,19 +668,51 @@ class YoutubeDownloader:
 			format_names += f"{video_format.name}{is_default}\n"
 		return format_names
 
-	def download(
-		self, url: str, content_type: ContentType, download_format_name: "str | None"
-	) -> DownloaderResult:
-		"""Generic download function, sets download_format to default if download_format_name is None"""
+	def __get_download_format(
+		self, content_type: ContentType, download_format_name: "str | None"
+	) -> DlFormat:
+		"""Returns the default format if download_format_name is None"""
 		if not download_format_name:
-			dl_format = self.__get_default_download_format(content_type=content_type)
-		else:
-			dl_format = self.__get_download_format_from_name(
-				content_type=content_type, format_name=download_format_name
-			)
+			return self.__get_default_download_format(content_type=content_type)
+		return self.__get_download_format_from_name(
+			content_type=content_type, format_name=download_format_name
+		)
 
-		options = YoutubeDlOptions()
-		options.set_format(content_type, dl_format.value)
+	def get_download_format_name(
+		self, content_type: ContentType, download_format_name: "str | None"
+	) -> str:
+		"""Returns the name of the format that will be used, raises DownloadError if format is not supported"""
+		return self.__get_download_format(content_type, download_format_name).name
 
-		result = self.__perform_download(url, options.get_for_content_type(content_type))
-		return result
+	def download(
+		self,
+		url: str,
+		content_type: ContentType,
+		download_format_name: "str | None",
+		trace: "JobTrace | None" = None,
+		on_progress: "Callable[[DownloadProgress], None] | None" = None,
+	) -> DownloadedMedia:
+		"""
+		Download stage, sets download_format to default if download_format_name is None.
+		The result must be passed to postprocess. on_progress is called from the downloading thread.
+		"""
+		dl_format = self.__get_download_format(content_type, download_format_name)
+
+		storage_reservation = self.__temp_storage.reserve(content_type)
+		options = YoutubeDlOptions(content_type, storage_reservation.path)
+		options.set_format(dl_format.value)
+
+		trace = trace or JobTrace(url=url, content_type=content_type.value)
+		return self.__perform_download(
+			url, options.get(), dl_format, storage_reservation, trace, on_progress
+		)
+
+	def postprocess(
+		self,
+		downloaded: DownloadedMedia,
+		trace: "JobTrace | None" = None,
+		on_progress: "Callable[[DownloadProgress], None] | None" = None,
+	) -> DownloaderResult:
+		"""Postprocess stage, runs ffmpeg conversions of the downloaded media. on_progress is called from the processing thread."""
+		trace = trace or JobTrace(content_type=downloaded.options["content_type"].value)
+		return self.__perform_postprocess(downloaded, trace, on_progress)
@@ -1,38 +1,111 @@
+import time
+import asyncio
 import logging
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 
-import isodate
-from googleapiclient.discovery import build
-
+from telegram_youtube_downloader.utils.ttl_cache import TtlCache
 from telegram_youtube_downloader.utils.config_utils import ConfigUtils
 from telegram_youtube_downloader.errors.search_error import SearchError
 from telegram_youtube_downloader.utils.api_key_utils import ApiKeyUtils
+from telegram_youtube_downloader.utils.metrics_utils import MetricsUtils
+from telegram_youtube_downloader.errors.search_quota_error import SearchQuotaError
+from telegram_youtube_downloader.statics.search_backend_type import SearchBackendType
+from telegram_youtube_downloader.search_backends.search_backend import SearchBackend
+from telegram_youtube_downloader.search_backends.yt_dlp_search_backend import YtDlpSearchBackend
+from telegram_youtube_downloader.search_backends.youtube_api_search_backend import (
+	YoutubeApiSearchBackend,
+)
 
 
 class YoutubeSearcher:
+	"""
+	Runs searches on the configured primary backend and fails over to the fallback backend.
+	A backend that runs out of quota is skipped until its cooldown ends.
+	"""
+
+	# search.list costs 100 units, the batched videos.list costs 1
+	__quota_units_per_search = 101
+
 	def __init__(self) -> None:
-		self.__api_key = ApiKeyUtils.get_youtube_api_key()
 		self.__search_options = ConfigUtils.get_app_config().youtube_search_options
 		self.__logger = logging.getLogger(f"tyd.{self.__class__.__name__}")
-		self.__youtube_url_base = "https://www.youtube.com/watch?v="
-		self.__is_initialized = False
-		if self.__api_key:
-			self.__youtube = build("youtube", "v3", developerKey=self.__api_key)
-			self.__is_initialized = True
-
-	def __getVideoDuration(self, videoId):
-		"""Fetches and converts video duration from iso ISO 8601 to h:m:s format, catches any errors"""
-		try:
-			video_detail = (
-				self.__youtube.videos()
-				.list(id=videoId, part="contentDetails", maxResults=1)
-				.execute()
-			)
-			return str(
-				isodate.parse_duration(video_detail["items"][0]["contentDetails"]["duration"])
-			)
-		except Exception:
-			self.__logger.warning("Unknown error", exc_info=True)
-			return "??:??"
+		self.__executor = ThreadPoolExecutor(
+			max_workers=self.__search_options.max_concurrent_searches,
+			thread_name_prefix="SearchWorker",
+		)
+		cache_options = self.__search_options.search_cache_options
+		self.__search_cache = TtlCache(cache_options.max_size, cache_options.ttl_seconds)
+		MetricsUtils.register_cache("search", self.__search_cache.get_stats)
+		self.__search_count = 0
+		self.__search_seconds_total = 0.0
+		# Backend type -> monotonic time until the backend is skipped
+		self.__backend_cooldowns: dict[SearchBackendType, float] = {}
+		self.__backends = self.__build_backends()
+		self.__is_initialized = len(self.__backends) > 0
+
+	def __build_backend(self, backend_type: SearchBackendType) -> SearchBackend:
+		timeout_seconds = self.__search_options.timeout_seconds
+		if backend_type == SearchBackendType.YOUTUBE_API:
+			return YoutubeApiSearchBackend(ApiKeyUtils.get_youtube_api_key(), timeout_seconds)
+		return YtDlpSearchBackend(timeout_seconds)
+
+	def __build_backends(self) -> list[SearchBackend]:
+		"""Primary backend first, unavailable backends (Ex: api key is not set) are left out"""
+		backend_types = [self.__search_options.primary_backend]
+		fallback_backend = self.__search_options.fallback_backend
+		if fallback_backend is not None and fallback_backend not in backend_types:
+			backend_types.append(fallback_backend)
+
+		backends = []
+		for backend_type in backend_types:
+			backend = self.__build_backend(backend_type)
+			if not backend.is_available():
+				self.__logger.warning(f"Search backend {backend_type.value} is not available")
+				continue
+			backends.append(backend)
+
+		self.__logger.info(f"Search backends: {[backend.get_type().value for backend in backends]}")
+		return backends
+
+	def __is_cooling_down(self, backend: SearchBackend) -> bool:
+		return self.__backend_cooldowns.get(backend.get_type(), 0.0) > time.monotonic()
+
+	def __search_with_failover(self, query: str) -> list[dict[str, str]]:
+		"""Tries backends in order, only quota errors fail over to the next backend"""
+		max_results = self.__search_options.max_results
+		available_backends = [b for b in self.__backends if not self.__is_cooling_down(b)]
+		if not available_backends:
+			raise SearchError("Search quota exceeded, please try again later")
+
+		for backend in available_backends:
+			backend_type = backend.get_type()
+			try:
+				self.__logger.info(f"Search ran with query '{query}' on {backend_type.value}")
+				return backend.search(query, max_results)
+			except SearchQuotaError:
+				cooldown_seconds = self.__search_options.quota_cooldown_seconds
+				self.__logger.warning(
+					f"Search backend {backend_type.value} is out of quota, skipped for {cooldown_seconds} seconds"
+				)
+				self.__backend_cooldowns[backend_type] = time.monotonic() + cooldown_seconds
+
+		raise SearchError("Search quota exceeded, please try again later")
+
+	def __get_cache_key(self, query: str) -> str:
+		"""Queries that differ only in case, whitespace or unicode form share the same key"""
+		normalized_query = " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+		return f"{self.__search_options.max_results}|{normalized_query}"
+
+	def get_search_cache_stats(self) -> dict[str, float]:
+		"""Cache counters with estimated quota and latency saved by cache hits"""
+		stats: dict[str, float] = {**self.__search_cache.get_stats()}
+		average_search_seconds = (
+			self.__search_seconds_total / self.__search_count if self.__search_count else 0.0
+		)
+		stats["quota_units_saved"] = stats["hits"] * YoutubeSearcher.__quota_units_per_search
+		stats["latency_saved_seconds"] = round(stats["hits"] * average_search_seconds, 3)
+		return stats
 
 	def is_initialized(self):
 		return self.__is_initialized
@@ -42,27 +115,7 @@ class YoutubeSearcher:
 			raise SearchError("Search is not available")
 
 		try:
-			self.__logger.info(f"Search ran with query '{query}'")
-
-			search_results = (
-				self.__youtube.search()
-				.list(
-					q=query,
-					part="snippet",
-					type="video",
-					maxResults=self.__search_options.max_results,
-				)
-				.execute()
-			)
-
-			result = []
-			for item in search_results["items"]:
-				temp = {
-					"title": item["snippet"]["title"],
-					"url": self.__youtube_url_base + item["id"]["videoId"],
-					"duration": self.__getVideoDuration(item["id"]["videoId"]),
-				}
-				result.append(temp)
+			result = self.__search_with_failover(query)
 
 			if len(result) == 0:
 				raise SearchError(f"No results found for query {query}")
@@ -75,3 +128,33 @@ class YoutubeSearcher:
 		except:
 			self.__logger.error("Unknown error", exc_info=True)
 			raise SearchError()
+
+	async def search_async(self, query):
+		"""
+		Returns cached results or runs search on the search executor without blocking the event loop.
+		Raises SearchError on timeout.
+		"""
+		cache_key = self.__get_cache_key(query)
+		cached_result = self.__search_cache.get(cache_key)
+		if cached_result is not None:
+			self.__logger.info(
+				f"Search cache hit for '{cache_key}', {self.get_search_cache_stats()}"
+			)
+			return cached_result
+		self.__logger.info(f"Search cache miss for '{cache_key}', {self.get_search_cache_stats()}")
+
+		loop = asyncio.get_running_loop()
+		search_start = time.time()
+		try:
+			result = await asyncio.wait_for(
+				loop.run_in_executor(self.__executor, self.search, query),
+				timeout=self.__search_options.timeout_seconds,
+			)
+		except TimeoutError:
+			self.__logger.warning(f"Search timed out for query '{query}'")
+			raise SearchError("Search timed out, please try again later")
+
+		self.__search_count += 1
+		self.__search_seconds_total += time.time() - search_start
+		self.__search_cache.set(cache_key, result)
+		return result